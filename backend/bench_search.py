@@ -0,0 +1,109 @@
+"""Measure in-memory name search (NameIndex, used on MockDB) at scale.
+
+Usage:
+    python bench_search.py --videos 1000000
+    python bench_search.py --videos 200000 --check
+
+Builds a NameIndex of synthetic names: two words from a small vocabulary of
+common words, one from 50000 rare ones, plus a unique upload id, so one-letter prefixes
+cover tens of thousands of distinct tokens. Each video gets one of 1000
+owners and a status/sensitivity mix like a real library. For each query it
+prints the best of --repeat runs for the first page (what GET /videos
+returns), and with --check compares the results against a full scan.
+"""
+import argparse
+import random
+import string
+import time
+
+from search import NameIndex, parse_query, tokenize
+
+COMMON = ["trip", "beach", "travel", "tree", "train", "birthday", "holiday", "wedding", "party", "xmas"]
+STATUSES = ["completed"] * 90 + ["processing"] * 5 + ["failed"] * 2 + ["uploading"] * 3
+
+QUERIES = [
+    ("trip beach", {}, False),
+    ("trip b", {"status": "completed"}, False),
+    ("tr", {"status": "failed"}, False),
+    ("a", {}, False),
+    ("x", {}, False),
+    ("x", {"status": "failed"}, False),
+    ("e", {"status": "processing"}, False),
+    ("q", {"sensitivity": "flagged"}, False),
+    ("ab", {}, True),
+    ("holiday a", {"status": "uploading"}, False),
+    ("zzzz", {}, False),
+]
+
+
+def build(videos, seed):
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    rare = ["".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(50000)]
+    index = NameIndex()
+    docs = []
+    for i in range(videos):
+        words = rng.choices(COMMON, k=2) + rng.choices(rare, k=1)
+        name = f"{' '.join(words)}_{''.join(rng.choices(letters + string.digits, k=8))}.mp4"
+        status = rng.choice(STATUSES)
+        sensitivity = rng.choice(["safe", "safe", "flagged"]) if status == "completed" else None
+        owner = str(i % 1000)
+        index.add(str(i), name, owner=owner, status=status, sensitivity=sensitivity)
+        docs.append((str(i), tokenize(name), owner, {"status": status, "sensitivity": sensitivity}))
+    return index, docs
+
+
+def first_page(index, q, owner, filters, limit):
+    found = []
+    for ids in index.search(q, owner=owner, filters=filters, batch_size=limit):
+        found += ids
+        if len(found) >= limit:
+            break
+    return found[:limit]
+
+
+def scan(docs, q, owner, filters, limit):
+    terms, prefix = parse_query(q)
+    found = []
+    for video_id, tokens, doc_owner, fields in reversed(docs):
+        if (
+            all(term in tokens for term in terms)
+            and (prefix is None or any(token.startswith(prefix) for token in tokens))
+            and (owner is None or doc_owner == owner)
+            and all(fields[k] == v for k, v in filters.items())
+        ):
+            found.append(video_id)
+            if len(found) == limit:
+                break
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=1000, help="page size, as in list_videos")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check", action="store_true", help="compare every result with a full scan")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index, docs = build(args.videos, args.seed)
+    print(f"indexed {len(index)} videos, {len(index.postings)} tokens in {time.perf_counter() - started:.1f} s")
+    print(f"{'query':<22} {'filters':<28} {'results':>8} {'ms':>8}")
+
+    for q, filters, by_owner in QUERIES:
+        owner = "7" if by_owner else None
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            found = first_page(index, q, owner, filters, args.limit)
+            best = min(best, time.perf_counter() - started)
+        if args.check and found != scan(docs, q, owner, filters, args.limit):
+            raise SystemExit(f"Wrong results for {q!r} {filters}")
+        label = {**filters, **({"owner": owner} if owner else {})}
+        print(f"{q!r:<22} {str(label):<28} {len(found):>8} {best * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Measure Socket.IO memory per connection and the video update throughput ceiling.
+
+Usage:
+    python bench_sockets.py --connections 1000 5000 10000 --updates 20
+    SOCKETIO_ENCODING=compact python bench_sockets.py --connections 10000
+
+Starts the app in a child process (one uvicorn worker, MockDB) with one user
+per connection, then opens authenticated websocket connections from this
+process, each acting as one user's dashboard. For each connection count it
+prints the server's resident memory per socket, then has the server queue
+`--updates` progress updates for every user's room through the same batcher
+the processing pipeline uses, and prints how many updates/sec reached the
+clients and in how many frames.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from bench_workers import ROOT_DIR, free_port, server_env
+
+
+def serve(port, users, token_file):
+    """Child process: the app plus `users` bench users whose tokens go to `token_file`."""
+    import uvicorn
+    import server
+
+    user_ids = [f"bench-{i}" for i in range(users)]
+
+    @server.sio.on("bench_flood")
+    async def bench_flood(sid, data):
+        for i in range(data["updates"]):
+            video_id = str(uuid.UUID(int=i + 1))
+            for user_id in user_ids[:data["rooms"]]:
+                server.video_updates.queue(user_id, {"video_id": video_id, "progress": i % 101, "status": "processing"})
+
+    async def main():
+        config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+        task = asyncio.create_task(uvicorn.Server(config).serve())
+        while server.readiness.state != "ready":
+            await asyncio.sleep(0.05)
+        tokens = []
+        for user_id in user_ids:
+            await server.db.users.insert_one({
+                "id": user_id,
+                "email": f"{user_id}@bench.local",
+                "username": user_id,
+                "role": "viewer",
+                "password_hash": ""
+            })
+            tokens.append(server.create_access_token({"sub": user_id}))
+        # Written then renamed, so the parent never reads a partial file
+        Path(f"{token_file}.tmp").write_text(json.dumps(tokens))
+        os.replace(f"{token_file}.tmp", token_file)
+        await task
+
+    asyncio.run(main())
+
+
+def rss_bytes(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class Dashboard:
+    """A minimal Socket.IO websocket client that counts `video_updates`."""
+
+    def __init__(self):
+        self.updates = 0
+        self.frames = 0
+        self.reader = None
+        self.writer = None
+        self.task = None
+        self.binary_pending = False
+
+    async def connect(self, port, token):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write(
+            f"GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        response = await self.reader.readuntil(b"\r\n\r\n")
+        if not response.startswith(b"HTTP/1.1 101"):
+            raise RuntimeError(f"Websocket upgrade failed: {response[:60]!r}")
+        await self.recv()  # Engine.IO open
+        self.send("40" + json.dumps({"token": token}))
+        _, reply = await self.recv()
+        if not reply.startswith(b"40"):
+            raise RuntimeError(f"Socket.IO connect refused: {reply[:100]!r}")
+        self.task = asyncio.create_task(self.listen())
+
+    def send(self, text, opcode=1):
+        payload = text.encode() if isinstance(text, str) else text
+        header = bytearray([0x80 | opcode])
+        if len(payload) < 126:
+            header.append(0x80 | len(payload))
+        elif len(payload) < 65536:
+            header += bytes([0x80 | 126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", len(payload))
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.writer.write(bytes(header) + mask + masked)
+
+    async def recv(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+        return first & 0x0F, await self.reader.readexactly(length)
+
+    async def listen(self):
+        from realtime import COMPACT_UPDATE
+
+        while True:
+            opcode, payload = await self.recv()
+            if opcode == 8:
+                return
+            if opcode == 9:
+                self.send(payload, opcode=10)
+            elif opcode == 2 and self.binary_pending:
+                self.binary_pending = False
+                self.updates += (len(payload) - 1) // COMPACT_UPDATE.size
+                self.frames += 1
+            elif payload == b"2":
+                self.send("3")  # Engine.IO ping
+            elif payload.startswith(b"42"):
+                event, data = json.loads(payload[2:])
+                if event == "video_updates":
+                    self.updates += len(data)
+                    self.frames += 1
+            elif payload.startswith(b"451-"):
+                self.binary_pending = True
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+        self.writer.close()
+
+
+async def run(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    port = free_port()
+    users = max(args.connections)
+    token_file = Path(tempfile.mkdtemp()) / "tokens.json"
+    child = subprocess.Popen(
+        [sys.executable, __file__, "--serve", str(port), "--users", str(users), "--token-file", str(token_file)],
+        cwd=ROOT_DIR,
+        env=server_env()  # always MockDB, so bench users never reach a real database
+    )
+    try:
+        deadline = time.monotonic() + args.timeout
+        while not token_file.exists():
+            if time.monotonic() > deadline or child.poll() is not None:
+                raise RuntimeError("Server did not start")
+            await asyncio.sleep(0.1)
+        tokens = json.loads(token_file.read_text())
+
+        baseline = rss_bytes(child.pid)
+        print(f"server RSS before connecting: {baseline / 2 ** 20:.1f} MiB")
+        print(f"{'sockets':>8} {'KiB/socket':>11} {'updates':>9} {'frames':>8} {'seconds':>8} {'updates/s':>11}")
+
+        dashboards = []
+        for count in sorted(args.connections):
+            while len(dashboards) < count:
+                batch = [Dashboard() for _ in range(min(args.connect_batch, count - len(dashboards)))]
+                await asyncio.gather(*(
+                    d.connect(port, tokens[len(dashboards) + i]) for i, d in enumerate(batch)
+                ))
+                dashboards += batch
+            await asyncio.sleep(1)
+            per_socket = (rss_bytes(child.pid) - baseline) / count
+
+            for d in dashboards:
+                d.updates = d.frames = 0
+            expected = args.updates * count
+            started = time.perf_counter()
+            dashboards[0].send("42" + json.dumps(["bench_flood", {"updates": args.updates, "rooms": count}]))
+            deadline = time.monotonic() + args.timeout
+            received = 0
+            while time.monotonic() < deadline:
+                received = sum(d.updates for d in dashboards)
+                if received >= expected:
+                    break
+                await asyncio.sleep(0.005)
+            elapsed = time.perf_counter() - started
+            frames = sum(d.frames for d in dashboards)
+            print(f"{count:>8} {per_socket / 1024:>11.1f} {received:>9} {frames:>8} {elapsed:>8.2f} {received / elapsed:>11.0f}")
+
+        for d in dashboards:
+            d.close()
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--updates", type=int, default=20, help="distinct video updates per room")
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--users", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--token-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.users, args.token_file)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
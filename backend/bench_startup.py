@@ -0,0 +1,108 @@
+"""Report import time and measure time-to-first-request against a budget.
+
+Usage:
+    python bench_startup.py --budget 5 --top 15
+
+Prints the slowest imports pulled in by `import server` (from
+`python -X importtime`), then starts `gunicorn -c gunicorn.conf.py server:app`
+and times how long it takes until /api/health/live and /api/health/ready
+answer 200. Exits with status 1 when readiness takes longer than the budget.
+The server runs on MockDB unless --mongo-url is given.
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from bench_workers import ROOT_DIR, free_port, server_env
+
+
+def import_report(top):
+    """Slowest direct imports of the server module, as (cumulative_us, name)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True
+    )
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == "server":
+                children.sort(reverse=True)
+                return int(cumulative), children[:top]
+            children = []
+    raise RuntimeError(f"Could not import server:\n{result.stderr[-2000:]}")
+
+
+def wait_for(port, path, deadline):
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return time.monotonic()
+        except OSError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def time_to_first_request(timeout, mongo_url):
+    port = free_port()
+    env = server_env(mongo_url, PORT=str(port))
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app", "--log-level", "warning"],
+        cwd=ROOT_DIR,
+        env=env
+    )
+    try:
+        deadline = started + timeout
+        live = wait_for(port, "/api/health/live", deadline)
+        ready = wait_for(port, "/api/health/ready", deadline) if live else None
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    return (
+        live - started if live else None,
+        ready - started if ready else None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("STARTUP_BUDGET_SECONDS", "5")))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--mongo-url", help="MongoDB to connect to (default: MockDB, ignoring backend/.env)")
+    args = parser.parse_args()
+
+    total, slowest = import_report(args.top)
+    print(f"import server: {total / 1000:.0f} ms")
+    for cumulative, name in slowest:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+    live, ready = time_to_first_request(args.timeout, args.mongo_url)
+    print()
+    print(f"live:  {f'{live:.2f} s' if live is not None else 'timed out'}")
+    print(f"ready: {f'{ready:.2f} s' if ready is not None else 'timed out'} (budget {args.budget:.2f} s)")
+
+    if ready is None or ready > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Measure how requests/sec scales with the gunicorn worker count.
+
+Usage:
+    python bench_workers.py --workers 1 2 4 --duration 10 --path /api/health
+
+Starts `gunicorn -c gunicorn.conf.py server:app` once per worker count, drives
+it with keep-alive HTTP clients running in separate processes and prints the
+throughput for each run. The server runs on MockDB unless --mongo-url is
+given; MONGO_URL from backend/.env is never used.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(mongo_url=None, **overrides):
+    """Environment for a bench server: MockDB unless `mongo_url` is given, whatever backend/.env says."""
+    return dict(os.environ, MONGO_URL=mongo_url or "", DOTENV_OVERRIDE="0", **overrides)
+
+
+def wait_ready(port, path, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not become ready")
+
+
+def client(port, path, headers, duration, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    done = errors = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    results.put((done, errors))
+
+
+def run(workers, args):
+    port = free_port()
+    env = server_env(args.mongo_url, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app", "--log-level", "warning"],
+        cwd=ROOT_DIR,
+        env=env
+    )
+    try:
+        wait_ready(port, args.path)
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client, args=(port, args.path, headers, args.duration, results))
+            for _ in range(args.clients)
+        ]
+        for p in clients:
+            p.start()
+        totals = [results.get() for _ in clients]
+        for p in clients:
+            p.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    done = sum(t[0] for t in totals)
+    errors = sum(t[1] for t in totals)
+    return done / args.duration, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=multiprocessing.cpu_count() * 2)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", default="/api/health")
+    parser.add_argument("--token", help="Bearer token for authenticated paths")
+    parser.add_argument("--mongo-url", help="MongoDB to run against (default: MockDB, ignoring backend/.env)")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'errors':>7}")
+    baseline = None
+    for workers in args.workers:
+        rps, errors = run(workers, args)
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.0f} {rps / baseline:>7.2f}x {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import os
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Halves every counter of a sketch row in one bytes.translate()
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+class FrequencySketch:
+    """TinyLFU popularity estimate: a count-min sketch behind a doorkeeper.
+
+    The doorkeeper (a small Bloom filter) absorbs the first access of each
+    key so one-hit wonders never reach the counters. Counters saturate at 15
+    and are halved (and the doorkeeper cleared) every `sample_size` accesses,
+    so the estimate tracks recent popularity.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int, sample_size: int):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.mask = self.width - 1
+        self.counters = [bytearray(self.width) for _ in range(self.DEPTH)]
+        self.doorkeeper = bytearray(self.width)
+        self.sample_size = sample_size
+        self.additions = 0
+
+    def _indexes(self, key: Hashable) -> List[int]:
+        # Double hashing: row i probes h1 + i * h2
+        h = hash(key)
+        h2 = (h >> 32) | 1
+        return [(h + i * h2) & self.mask for i in range(self.DEPTH)]
+
+    def record(self, key: Hashable):
+        indexes = self._indexes(key)
+        if not all(self.doorkeeper[i] for i in indexes[:2]):
+            for i in indexes[:2]:
+                self.doorkeeper[i] = 1
+        else:
+            for row, i in zip(self.counters, indexes):
+                if row[i] < self.MAX_COUNT:
+                    row[i] += 1
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        indexes = self._indexes(key)
+        count = min(row[i] for row, i in zip(self.counters, indexes))
+        if all(self.doorkeeper[i] for i in indexes[:2]):
+            count += 1
+        return count
+
+    def _age(self):
+        for row in self.counters:
+            row[:] = row.translate(_HALVE)
+        self.doorkeeper[:] = bytes(self.width)
+        self.additions //= 2
+
+
+class Block:
+    """A pinned view of one cached (or uncached, just read) block."""
+
+    __slots__ = ("view", "slot")
+
+    def __init__(self, view: memoryview, slot: Optional[int]):
+        self.view = view
+        self.slot = slot
+
+
+class BlockCache:
+    """Fixed-size, aligned file blocks in one preallocated buffer.
+
+    Blocks are keyed by (video id, file name, block number), so once a
+    video's file is replaced (transcoded) no worker serves blocks of the old
+    file, including workers that never saw the invalidation. Blocks are
+    evicted in LRU order, but a new block only displaces the LRU victim when
+    TinyLFU estimates it is more popular, so a scan through a cold video
+    can't flush the hot set.
+    Reads go straight into the slab (os.preadv) and callers get memoryview
+    slices of it; a slot stays pinned until the caller releases it, and
+    pinned slots are never reused.
+    """
+
+    EVICTION_SCAN = 16
+
+    def __init__(self, capacity_bytes: int, block_size: int = 256 * 1024):
+        self.block_size = block_size
+        self.nblocks = capacity_bytes // block_size
+        self.slab = bytearray(self.nblocks * block_size)
+        self.view = memoryview(self.slab)
+
+        self.slots: "OrderedDict[Tuple[str, str, int], int]" = OrderedDict()  # LRU order
+        self.lengths = [0] * self.nblocks
+        self.pins = [0] * self.nblocks
+        self.free = list(range(self.nblocks))
+        self.retired = set()  # invalidated slots still pinned by a reader
+        self.by_video: Dict[str, set] = {}  # video id -> {(file name, block)}
+        self.sketch = FrequencySketch(width=max(self.nblocks * 4, 1024), sample_size=max(self.nblocks * 10, 1000))
+
+        self.hits = 0
+        self.misses = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.video_stats: Dict[str, List[int]] = {}  # video id -> [hits, misses]
+
+    @property
+    def enabled(self) -> bool:
+        return self.nblocks > 0
+
+    async def read(self, video_id: str, filename: str, fd: int, block: int) -> Block:
+        """The given block of the video's open file `filename`, pinned; release() it after use.
+
+        The read itself runs in a thread; everything else happens on the
+        event loop, so no locking is needed.
+        """
+        key = (video_id, filename, block)
+        self.sketch.record(key)
+        stats = self.video_stats.setdefault(video_id, [0, 0])
+
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.slots.move_to_end(key)
+            self.pins[slot] += 1
+            self.hits += 1
+            stats[0] += 1
+            return Block(self.view[slot * self.block_size:slot * self.block_size + self.lengths[slot]], slot)
+
+        self.misses += 1
+        stats[1] += 1
+        offset = block * self.block_size
+        slot = self._allocate(key)
+        if slot is None:
+            data = await asyncio.to_thread(os.pread, fd, self.block_size, offset)
+            return Block(memoryview(data), None)
+
+        # Pinned while filling so it can't be handed out or evicted
+        self.pins[slot] += 1
+        invalidations = self.invalidations
+        buffer = self.view[slot * self.block_size:(slot + 1) * self.block_size]
+        try:
+            length = await asyncio.to_thread(os.preadv, fd, [buffer], offset)
+        except BaseException:
+            self.pins[slot] -= 1
+            self.free.append(slot)
+            raise
+
+        self.lengths[slot] = length
+        if key in self.slots or invalidations != self.invalidations:
+            # Another reader filled it meanwhile, or a video was invalidated
+            self.retired.add(slot)
+        else:
+            self.slots[key] = slot
+            self.by_video.setdefault(video_id, set()).add((filename, block))
+        return Block(buffer[:length], slot)
+
+    def _allocate(self, key) -> Optional[int]:
+        if self.nblocks == 0:
+            return None
+        if self.free:
+            self.admitted += 1
+            return self.free.pop()
+
+        # Oldest unpinned block (among the few oldest) is the eviction candidate
+        victim = None
+        for candidate, slot in itertools.islice(self.slots.items(), self.EVICTION_SCAN):
+            if not self.pins[slot]:
+                victim = candidate
+                break
+        if victim is None or self.sketch.estimate(key) <= self.sketch.estimate(victim):
+            self.rejected += 1
+            return None
+
+        slot = self.slots.pop(victim)
+        self._forget(victim)
+        self.evictions += 1
+        self.admitted += 1
+        return slot
+
+    def release(self, block: Block):
+        slot = block.slot
+        if slot is None:
+            return
+        self.pins[slot] -= 1
+        if not self.pins[slot] and slot in self.retired:
+            self.retired.discard(slot)
+            self.free.append(slot)
+
+    def invalidate(self, video_id: str):
+        self.invalidations += 1
+        for filename, block in self.by_video.pop(video_id, ()):
+            slot = self.slots.pop((video_id, filename, block), None)
+            if slot is None:
+                continue
+            if self.pins[slot]:
+                self.retired.add(slot)
+            else:
+                self.free.append(slot)
+        self.video_stats.pop(video_id, None)
+
+    def _forget(self, key):
+        video_id, filename, block = key
+        blocks = self.by_video.get(video_id)
+        if blocks is not None:
+            blocks.discard((filename, block))
+            if not blocks:
+                del self.by_video[video_id]
+
+    def stats(self, top: int = 50) -> dict:
+        lookups = self.hits + self.misses
+        videos = sorted(self.video_stats.items(), key=lambda item: item[1][0] + item[1][1], reverse=True)
+        return {
+            "capacity_bytes": len(self.slab),
+            "block_size": self.block_size,
+            "blocks": self.nblocks,
+            "blocks_used": len(self.slots),
+            "blocks_pinned": sum(1 for pins in self.pins if pins),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+            "videos": [
+                {
+                    "video_id": video_id,
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / (hits + misses), 4),
+                    "cached_bytes": len(self.by_video.get(video_id, ())) * self.block_size,
+                }
+                for video_id, (hits, misses) in videos[:top]
+            ],
+        }
+
@@ -0,0 +1,77 @@
+import logging
+import os
+
+# pymongo/motor are only imported when connecting: they are slow to import and
+# not needed at all when running on MockDB
+READ_PREFERENCES = {
+    "primary": "PRIMARY",
+    "primaryPreferred": "PRIMARY_PREFERRED",
+    "secondary": "SECONDARY",
+    "secondaryPreferred": "SECONDARY_PREFERRED",
+    "nearest": "NEAREST",
+}
+
+pool_metrics = None  # mongo_metrics.PoolMetrics, created with the first client
+
+
+def client_options() -> dict:
+    """MongoClient keyword arguments from MONGO_* environment variables."""
+    options = {
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+        "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "event_listeners": [pool_metrics],
+    }
+    if os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS"):
+        options["waitQueueTimeoutMS"] = int(os.environ["MONGO_WAIT_QUEUE_TIMEOUT_MS"])
+    if os.environ.get("MONGO_COMPRESSORS"):
+        # e.g. "zstd,snappy,zlib" (zstd and snappy need their optional packages)
+        options["compressors"] = os.environ["MONGO_COMPRESSORS"]
+    return options
+
+
+def read_preference():
+    name = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"Unknown MONGO_READ_PREFERENCE {name!r}, expected one of {', '.join(READ_PREFERENCES)}")
+    from pymongo import ReadPreference
+    return getattr(ReadPreference, READ_PREFERENCES[name])
+
+
+async def connect(mongo_url, db_name, workers=1):
+    """Open the database for this worker.
+
+    Returns (client, db, read_db). `read_db` routes reads according to
+    MONGO_READ_PREFERENCE and is meant for read-heavy endpoints that tolerate
+    replication lag. Falls back to MockDB (client None) when MONGO_URL is unset
+    or the server doesn't answer a ping within the server selection timeout.
+    """
+    global pool_metrics
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from mongo_metrics import PoolMetrics
+        
+        if pool_metrics is None:
+            pool_metrics = PoolMetrics()
+
+        read_pref = read_preference()
+        client = None
+        try:
+            logging.info(f"Attempting to connect to MongoDB at {mongo_url.split('@')[-1] if '@' in mongo_url else '...'}")
+            client = AsyncIOMotorClient(mongo_url, **client_options())
+            await client.admin.command("ping")
+            db = client[db_name]
+            read_db = client.get_database(db_name, read_preference=read_pref)
+            logging.info("Connected to MongoDB")
+            return client, db, read_db
+        except Exception as e:
+            logging.error(f"Failed to connect to MongoDB: {e}")
+            if client:
+                client.close()
+
+    logging.warning("Using in-memory MockDB (Data will be lost on restart)")
+    if workers > 1:
+        logging.warning("MockDB state is per worker; set MONGO_URL when running more than one worker")
+    from mock_db import MockDB
+    db = MockDB()
+    return None, db, db
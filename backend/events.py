@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+from collections import Counter, deque
+from datetime import datetime, timezone
+from operator import itemgetter
+from pathlib import Path
+from typing import Deque, List, Optional
+
+
+class EventSink:
+    """Where batches of events end up, and how they are queried back."""
+
+    async def write(self, events: List[dict]) -> None:
+        raise NotImplementedError
+
+    async def query(self, since: Optional[datetime], until: Optional[datetime], filters: dict, limit: int) -> List[dict]:
+        """Matching events, newest first."""
+        raise NotImplementedError
+
+
+class MongoEventSink(EventSink):
+    """Events stored in a MongoDB collection, expired by a TTL index on `ts`."""
+
+    def __init__(self, collection, retention_days: float):
+        self.collection = collection
+        self.retention_days = retention_days
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("ts", expireAfterSeconds=int(self.retention_days * 86400))
+        await self.collection.create_index([("type", 1), ("ts", -1)])
+        await self.collection.create_index([("user_id", 1), ("ts", -1)])
+        await self.collection.create_index([("video_id", 1), ("ts", -1)])
+
+    async def write(self, events):
+        await self.collection.insert_many(events, ordered=False)
+
+    async def query(self, since, until, filters, limit):
+        query = dict(filters)
+        if since or until:
+            query["ts"] = {}
+            if since:
+                query["ts"]["$gte"] = since
+            if until:
+                query["ts"]["$lt"] = until
+        events = await self.collection.find(query, {"_id": 0}).sort("ts", -1).to_list(limit)
+        for event in events:
+            event["ts"] = event["ts"].replace(tzinfo=timezone.utc).isoformat()
+        return events
+
+
+class FileEventSink(EventSink):
+    """JSON lines in `directory/events.jsonl`, rotated at `max_bytes`.
+
+    Used with MockDB. Keeps `backups` rotated files (events.jsonl.1 is the
+    most recent); queries scan them newest first.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, backups: int):
+        self.path = directory / "events.jsonl"
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    async def write(self, events):
+        lines = "".join(json.dumps({**e, "ts": e["ts"].isoformat()}, default=str) + "\n" for e in events)
+        await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size + len(lines) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    async def query(self, since, until, filters, limit):
+        return await asyncio.to_thread(self._query, since, until, filters, limit)
+
+    def _query(self, since, until, filters, limit):
+        # Compare instants, not strings: callers may pass any UTC offset
+        since = _as_utc(since) if since else None
+        until = _as_utc(until) if until else None
+        # Each worker appends its own batches, so the files are only roughly
+        # in time order: every file is scanned and the newest matches kept
+        newest = heapq.nlargest(limit, self._matching(since, until, filters), key=itemgetter(0))
+        return [event for _, event in newest]
+
+    def _matching(self, since, until, filters):
+        files = [self.path] + [self.path.with_name(f"{self.path.name}.{i}") for i in range(1, self.backups + 1)]
+        for path in files:
+            if not path.exists():
+                continue
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+            for line in reversed(lines):
+                event = json.loads(line)
+                ts = datetime.fromisoformat(event["ts"])
+                if (since and ts < since) or (until and ts >= until):
+                    continue
+                if all(event.get(k) == v for k, v in filters.items()):
+                    yield ts, event
+
+
+def _as_utc(dt: datetime) -> datetime:
+    """Aware UTC datetime; naive ones are taken as UTC."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+class EventLog:
+    """Structured audit events, written in batches off the request path.
+
+    `emit` only appends to a bounded buffer and never waits: when the writer
+    falls behind and the buffer is full, events are dropped and counted per
+    type. A background task drains the buffer into the sink in batches of up
+    to `batch_size`, as soon as a batch is full and at least every
+    `flush_interval` seconds.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0):
+        self.buffer: Deque[dict] = deque()
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sink: Optional[EventSink] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self.emitted = 0
+        self.written = 0
+        self.dropped = Counter()
+        self.write_failures = 0
+        self.batches = 0
+
+    def emit(self, type: str, user_id: Optional[str] = None, video_id: Optional[str] = None, **data):
+        if len(self.buffer) >= self.max_queue:
+            self.dropped[type] += 1
+            return
+        self.buffer.append({
+            "ts": datetime.now(timezone.utc),
+            "type": type,
+            "user_id": user_id,
+            "video_id": video_id,
+            "worker": os.getpid(),
+            "data": data,
+        })
+        self.emitted += 1
+        if len(self.buffer) >= self.batch_size:
+            self._wake.set()
+
+    def start(self, sink: EventSink):
+        self.sink = sink
+        if self._writer is None:
+            self._stopping = False
+            self._writer = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Stop the writer after flushing what is buffered (for at most `timeout`)."""
+        if self._writer is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._writer, timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Dropped {len(self.buffer)} event(s) on shutdown")
+        self._writer = None
+
+    async def _run(self):
+        while True:
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            await self._flush()
+            if self._stopping:
+                return
+
+    async def _flush(self):
+        while self.buffer:
+            n = min(self.batch_size, len(self.buffer))
+            await self._write([self.buffer.popleft() for _ in range(n)])
+
+    async def _write(self, batch: List[dict]):
+        try:
+            await self.sink.write(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.write_failures += 1
+            for event in batch:
+                self.dropped[event["type"]] += 1
+            logging.error(f"Failed to write {len(batch)} event(s): {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sink": type(self.sink).__name__ if self.sink else None,
+            "queued": len(self.buffer),
+            "queue_capacity": self.max_queue,
+            "emitted": self.emitted,
+            "written": self.written,
+            "batches": self.batches,
+            "write_failures": self.write_failures,
+            "dropped": sum(self.dropped.values()),
+            "dropped_by_type": dict(self.dropped),
+        }
@@ -0,0 +1,28 @@
+import os
+
+# Multi-worker mode: gunicorn -c gunicorn.conf.py server:app
+#
+# Each worker imports the app itself, so a HUP reload starts the new workers on
+# the code now on disk. MongoDB clients are opened per worker in the startup
+# hook, so every worker gets its own connection pool. In-memory state (MockDB,
+# rate limits, response caches) stays per worker; see DEPLOYMENT_GUIDE.md for
+# the shared-state settings.
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn_worker.DrainingUvicornWorker"
+timeout = 120
+keepalive = 5
+
+# On SIGHUP (reload) or SIGTERM, old workers stop accepting connections and get
+# this long in total before gunicorn kills them: in-flight streams and
+# websockets get what PROCESSING_DRAIN_TIMEOUT and a short flush leave over
+# (see uvicorn_worker.py), then processing jobs are drained.
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+
+
+def when_ready(server):
+    server.log.info(f"Ready with {workers} worker(s)")
+
+
+def worker_int(worker):
+    worker.log.info(f"Worker {worker.pid} interrupted")
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+
+class BackgroundJobs:
+    """Keeps references to fire-and-forget tasks so they can be drained on shutdown."""
+
+    def __init__(self):
+        self.tasks = set()
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def drain(self, timeout: float) -> int:
+        """Wait for running jobs; cancel whatever is left after `timeout`.
+
+        Returns the number of jobs that had to be cancelled.
+        """
+        if not self.tasks:
+            return 0
+
+        _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+
+
+class Readiness:
+    """Worker lifecycle state reported by the readiness probe.
+
+    starting -> ready -> draining, or starting -> failed when initialization
+    raises. Only a ready worker should receive traffic.
+    """
+
+    def __init__(self):
+        self.state = "starting"
+        self.created_at = time.monotonic()
+        self.startup_seconds = None
+        self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def mark_ready(self):
+        self.startup_seconds = time.monotonic() - self.created_at
+        if self.state == "starting":
+            # Otherwise shutdown began while initializing
+            self.state = "ready"
+
+    def mark_failed(self, error: str):
+        self.state = "failed"
+        self.error = error
+
+    def mark_draining(self):
+        self.state = "draining"
+
+
+class ReadinessGate:
+    """ASGI middleware answering 503 to HTTP requests until startup has finished.
+
+    Lets the worker accept connections (and answer health checks under
+    `exempt_prefix`) while slow initialization runs in the background.
+    """
+
+    def __init__(self, app, readiness: Readiness, exempt_prefix: str = "/api/health"):
+        self.app = app
+        self.readiness = readiness
+        self.exempt_prefix = exempt_prefix
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or self.readiness.state in ("ready", "draining")
+            or scope["path"].startswith(self.exempt_prefix)
+        ):
+            return await self.app(scope, receive, send)
+
+        body = json.dumps({"detail": "Service is not ready"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,85 +1,168 @@
 import asyncio
 
+def _prepare(query):
+    # Turn $in/$nin lists into sets once per query instead of once per document
+    prepared = {}
+    for k, v in query.items():
+        if isinstance(v, dict) and ("$in" in v or "$nin" in v):
+            v = {op: set(arg) if op in ("$in", "$nin") else arg for op, arg in v.items()}
+        prepared[k] = v
+    return prepared
+
+def _matches(item, query):
+    for k, v in query.items():
+        if k == "$or":
+            if not any(_matches(item, _prepare(sub)) for sub in v):
+                return False
+            continue
+        value = item.get(k)
+        if isinstance(v, dict) and v and all(op.startswith("$") for op in v):
+            for op, arg in v.items():
+                if op == "$in":
+                    if value not in arg:
+                        return False
+                elif op == "$nin":
+                    if value in arg:
+                        return False
+                elif op == "$ne":
+                    if value == arg:
+                        return False
+                elif op == "$gt":
+                    if value is None or not value > arg:
+                        return False
+                elif op == "$gte":
+                    if value is None or not value >= arg:
+                        return False
+                elif op == "$lt":
+                    if value is None or not value < arg:
+                        return False
+                elif op == "$lte":
+                    if value is None or not value <= arg:
+                        return False
+                else:
+                    raise NotImplementedError(f"MockDB does not support {op}")
+        elif value != v:
+            return False
+    return True
+
+class MockUpdateResult:
+    def __init__(self, matched_count, modified_count):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+
 class MockCursor:
     def __init__(self, data):
         self.data = data
 
-    def sort(self, key, direction):
-        reverse = direction == -1
-        # Handle missing keys safely
-        self.data.sort(key=lambda x: x.get(key, ""), reverse=reverse)
+    def sort(self, key, direction=1):
+        # A single key, or a list of (key, direction) pairs like pymongo
+        keys = key if isinstance(key, list) else [(key, direction)]
+        # Stable sorts, least significant key first; missing keys sort as ""
+        for k, d in reversed(keys):
+            self.data.sort(key=lambda x: x.get(k, ""), reverse=d == -1)
         return self
 
     async def to_list(self, length):
-        return self.data[:length]
+        # Copy only what is returned to avoid accidental mutation
+        return [item.copy() for item in self.data[:length]]
 
 class MockCollection:
     def __init__(self, name):
         self.name = name
         self.data = []
+        # Documents by their "id" field (unique in every collection we use)
+        self._by_id = {}
+
+    def _candidates(self, query):
+        # Use the id index when the query pins down ids, else scan everything
+        v = query.get("id")
+        if v is None:
+            return self.data
+        if isinstance(v, dict):
+            if "$in" in v:
+                return [self._by_id[i] for i in v["$in"] if i in self._by_id]
+            return self.data
+        item = self._by_id.get(v)
+        return [item] if item is not None else []
+
+    def _index(self, document):
+        if "id" in document:
+            self._by_id[document["id"]] = document
 
     async def find_one(self, query, projection=None):
-        for item in self.data:
-            match = True
-            for k, v in query.items():
-                if item.get(k) != v:
-                    match = False
-                    break
-            if match:
+        query = _prepare(query)
+        for item in self._candidates(query):
+            if _matches(item, query):
                 # Return a copy to avoid accidental mutation if not intended
                 return item.copy()
         return None
 
     async def insert_one(self, document):
         # Store a copy
-        self.data.append(document.copy())
+        document = document.copy()
+        self.data.append(document)
+        self._index(document)
+        return True
+
+    async def insert_many(self, documents):
+        for document in documents:
+            await self.insert_one(document)
         return True
 
     async def update_one(self, query, update):
+        query = _prepare(query)
         # Find the actual item reference to update it
         target = None
-        for item in self.data:
-            match = True
-            for k, v in query.items():
-                if item.get(k) != v:
-                    match = False
-                    break
-            if match:
+        for item in self._candidates(query):
+            if _matches(item, query):
                 target = item
                 break
-        
+
+        modified = 0
         if target:
             if "$set" in update:
+                modified = int(any(target.get(k) != v for k, v in update["$set"].items()))
                 for k, v in update["$set"].items():
                     target[k] = v
+        return MockUpdateResult(int(target is not None), modified)
+
+    async def update_many(self, query, update):
+        query = _prepare(query)
+        for item in self._candidates(query):
+            if _matches(item, query) and "$set" in update:
+                for k, v in update["$set"].items():
+                    item[k] = v
         return True
 
     async def delete_one(self, query):
+        query = _prepare(query)
         target = None
-        for item in self.data:
-            match = True
-            for k, v in query.items():
-                if item.get(k) != v:
-                    match = False
-                    break
-            if match:
+        for item in self._candidates(query):
+            if _matches(item, query):
                 target = item
                 break
-        
+
         if target:
             self.data.remove(target)
+            self._by_id.pop(target.get("id"), None)
+        return True
+
+    async def delete_many(self, query):
+        query = _prepare(query)
+        removed = [item for item in self._candidates(query) if _matches(item, query)]
+        if removed:
+            removed_refs = {id(item) for item in removed}
+            self.data = [item for item in self.data if id(item) not in removed_refs]
+            for item in removed:
+                self._by_id.pop(item.get("id"), None)
         return True
 
     def find(self, query, projection=None):
+        query = _prepare(query)
         result = []
-        for item in self.data:
-            match = True
-            for k, v in query.items():
-                if item.get(k) != v:
-                    match = False
-                    break
-            if match:
-                result.append(item.copy())
+        for item in self._candidates(query):
+            if _matches(item, query):
+                result.append(item)
         return MockCursor(result)
 
 class MockDB:
@@ -87,5 +170,13 @@ class MockDB:
         self.users = MockCollection("users")
         self.videos = MockCollection("videos")
 
+    def __getattr__(self, name):
+        # Create other collections on first use, like MongoDB does
+        if name.startswith("_"):
+            raise AttributeError(name)
+        collection = MockCollection(name)
+        setattr(self, name, collection)
+        return collection
+
     def __getitem__(self, name):
         return getattr(self, name)
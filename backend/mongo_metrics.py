@@ -0,0 +1,72 @@
+from pymongo import monitoring
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters aggregated over every server in the topology."""
+
+    def __init__(self):
+        self.pools = 0
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_timeouts = 0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pool_clears += 1
+
+    def pool_closed(self, event):
+        self.pools -= 1
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event):
+        self.waiting -= 1
+        self.checkout_failures += 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self.checkout_timeouts += 1
+
+    def connection_checked_out(self, event):
+        self.waiting -= 1
+        self.checkouts += 1
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        self.in_use -= 1
+
+    def snapshot(self, max_pool_size=None) -> dict:
+        return {
+            "pools": self.pools,
+            "open_connections": self.open_connections,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "utilization": round(self.in_use / max_pool_size, 3) if max_pool_size else None,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "checkout_timeouts": self.checkout_timeouts,
+            "pool_clears": self.pool_clears,
+        }
@@ -0,0 +1,153 @@
+import contextvars
+import random
+import re
+import signal
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from starlette.routing import Match
+
+# Label of the request being profiled in the current task (None = not sampled)
+_profiled_route = contextvars.ContextVar("profiled_route", default=None)
+
+MAX_STACK_DEPTH = 64
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for live requests.
+
+    While a session is active, SIGPROF fires every `interval` seconds of CPU
+    time and the interrupted stack is recorded if the running task belongs to
+    a sampled request. Stacks are aggregated in collapsed format
+    (`route;frame;frame count`), ready for flamegraph tools.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.sample_rate = 0.0
+        self.route = None
+        self.interval = 0.005
+        self.started_at = None
+        self.until = None
+        self.requests_profiled = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self._route_re = None
+        self._previous_handler = None
+
+    def start(self, duration: float, sample_rate: float = 1.0, route: Optional[str] = None, interval: float = 0.005):
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Profiling requires the event loop to run in the main thread")
+        if self.active:
+            self.stop()
+
+        self.sample_rate = sample_rate
+        self.route = route
+        self._route_re = re.compile("^" + re.sub(r"\{[^}]+\}", "[^/]+", route) + "$") if route else None
+        self.interval = interval
+        self.started_at = time.time()
+        self.until = time.monotonic() + duration
+        self.requests_profiled = 0
+        self.samples = 0
+        self.stacks = Counter()
+
+        self._previous_handler = signal.signal(signal.SIGPROF, self._on_sample)
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+        self.active = True
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self._previous_handler = None
+
+    def expired(self) -> bool:
+        return self.active and time.monotonic() >= self.until
+
+    def should_profile(self, path: str) -> bool:
+        if self._route_re is not None and not self._route_re.match(path):
+            return False
+        return random.random() < self.sample_rate
+
+    def _on_sample(self, signum, frame):
+        label = _profiled_route.get()
+        if label is None:
+            return
+        if time.monotonic() >= self.until:
+            # Can't touch signal handlers from inside one; disarm and let the
+            # next request or status call finish the teardown.
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            return
+
+        names = []
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.append(label)
+        names.reverse()
+
+        self.stacks[";".join(names)] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def status(self) -> dict:
+        if self.expired():
+            self.stop()
+        return {
+            "active": self.active,
+            "sample_rate": self.sample_rate,
+            "route": self.route,
+            "interval": self.interval,
+            "started_at": self.started_at,
+            "remaining_seconds": max(0.0, self.until - time.monotonic()) if self.active else 0.0,
+            "requests_profiled": self.requests_profiled,
+            "samples": self.samples,
+            "unique_stacks": len(self.stacks),
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware tagging sampled requests for the RequestProfiler.
+
+    When no session is running this is a single attribute check per request.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.active or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if profiler.expired():
+            profiler.stop()
+            return await self.app(scope, receive, send)
+
+        if not profiler.should_profile(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        profiler.requests_profiled += 1
+        token = _profiled_route.set(f"{scope['method']} {self._route_template(scope)}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _profiled_route.reset(token)
+
+    @staticmethod
+    def _route_template(scope) -> str:
+        app = scope.get("app")
+        if app is not None:
+            for route in app.router.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    return route.path
+        return scope["path"]
@@ -0,0 +1,193 @@
+import math
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+class RateLimitBackend:
+    """Storage for token buckets and concurrency slots.
+
+    `take_token` returns 0 when a token was taken, otherwise the number of
+    seconds until one becomes available. `acquire_slot` returns a lease id,
+    or None at the limit; a lease that is never released (the worker died
+    mid-request) stops counting after `lease_seconds`.
+    """
+
+    async def take_token(self, key: str, rate: float, burst: int) -> float:
+        raise NotImplementedError
+
+    async def acquire_slot(self, key: str, limit: int, lease_seconds: float) -> Optional[str]:
+        raise NotImplementedError
+
+    async def release_slot(self, key: str, lease: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process backend. Limits are per worker when running several.
+
+    A bucket that has refilled to `burst` is the same as no bucket, so
+    buckets are dropped once full, oldest update first.
+    """
+
+    def __init__(self):
+        # key -> (tokens, updated_at, full_at), least recently updated first
+        self.buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self.slots: Dict[str, Dict[str, float]] = {}  # key -> {lease: expires_at}
+
+    def _evict_full(self, now: float):
+        while self.buckets:
+            key, (_, _, full_at) = next(iter(self.buckets.items()))
+            if full_at > now:
+                break
+            del self.buckets[key]
+
+    async def take_token(self, key, rate, burst):
+        now = time.monotonic()
+        self._evict_full(now)
+        tokens, updated_at, _ = self.buckets.pop(key, (float(burst), now, now))
+        tokens = min(float(burst), tokens + (now - updated_at) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        return retry_after
+
+    async def acquire_slot(self, key, limit, lease_seconds):
+        now = time.monotonic()
+        leases = {lease: expires_at for lease, expires_at in self.slots.get(key, {}).items() if expires_at > now}
+        if len(leases) >= limit:
+            self.slots[key] = leases
+            return None
+        lease = uuid.uuid4().hex
+        leases[lease] = now + lease_seconds
+        self.slots[key] = leases
+        return lease
+
+    async def release_slot(self, key, lease):
+        leases = self.slots.get(key, {})
+        leases.pop(lease, None)
+        if not leases:
+            self.slots.pop(key, None)
+
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """Backend shared by all workers, stored in a MongoDB collection.
+
+    Token buckets are approximated with fixed windows of `burst / rate`
+    seconds. Concurrency slots are a `slots:{key}` document holding one
+    lease per holder; expired leases are pruned on acquire. Both kinds of
+    document expire through a TTL index on `expires_at`.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take_token(self, key, rate, burst):
+        from pymongo import ReturnDocument
+
+        window = burst / rate
+        now = time.time()
+        window_start = math.floor(now / window) * window
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"bucket:{key}:{window_start}"},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {
+                    "expires_at": datetime.fromtimestamp(window_start + window, timezone.utc) + timedelta(minutes=1)
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc["count"] <= burst:
+            return 0.0
+        return window_start + window - now
+
+    async def acquire_slot(self, key, limit, lease_seconds):
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=lease_seconds)
+        lease = uuid.uuid4().hex
+        await self.collection.update_one(
+            {"_id": f"slots:{key}"},
+            {"$pull": {"leases": {"expires_at": {"$lte": now}}}}
+        )
+        try:
+            await self.collection.update_one(
+                # Fewer than `limit` leases: no element at index limit - 1
+                {"_id": f"slots:{key}", f"leases.{limit - 1}": {"$exists": False}},
+                {
+                    "$push": {"leases": {"id": lease, "expires_at": expires_at}},
+                    "$max": {"expires_at": expires_at}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The document exists but is already at the limit
+            return None
+        return lease
+
+    async def release_slot(self, key, lease):
+        await self.collection.update_one(
+            {"_id": f"slots:{key}"},
+            {"$pull": {"leases": {"id": lease}}}
+        )
+
+
+class RateLimit:
+    """Token bucket plus concurrency cap for one endpoint, keyed per user.
+
+    `acquire` returns a lease to hand back to `release`; `lease_seconds`
+    bounds how long a holder that never releases keeps its slot.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_concurrent: int, lease_seconds: float = 3600):
+        if rate_per_minute > 0 and burst < 1:
+            raise ValueError(f"{name} rate limit needs a burst of at least 1, got {burst}")
+        self.name = name
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.lease_seconds = lease_seconds
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.name}:{user_id}"
+
+    async def check(self, backend: RateLimitBackend, user_id: str):
+        if self.rate <= 0:
+            return
+        retry_after = await backend.take_token(self._key(user_id), self.rate, self.burst)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    async def acquire(self, backend: RateLimitBackend, user_id: str) -> Optional[str]:
+        if self.max_concurrent <= 0:
+            return None
+        lease = await backend.acquire_slot(self._key(user_id), self.max_concurrent, self.lease_seconds)
+        if lease is None:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many concurrent {self.name} requests",
+                headers={"Retry-After": "1"}
+            )
+        return lease
+
+    async def release(self, backend: RateLimitBackend, user_id: str, lease: Optional[str]):
+        if lease is None:
+            return
+        await backend.release_slot(self._key(user_id), lease)
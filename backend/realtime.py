@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Compact `video_updates` frames: a version byte, then 19 bytes per update
+COMPACT_VERSION = 1
+COMPACT_UPDATE = struct.Struct("!16sBBB")  # video id (UUID bytes), progress, status, sensitivity
+STATUS_CODES = ["uploading", "processing", "completed", "failed"]
+SENSITIVITY_CODES = [None, "safe", "flagged"]
+UNKNOWN = 255
+
+
+def encode_compact(updates: List[dict]) -> bytes:
+    out = bytearray([COMPACT_VERSION])
+    for update in updates:
+        progress = update.get("progress")
+        status = update.get("status")
+        # A missing sensitivity is "unchanged"; None ("not analysed yet") has its own code
+        sensitivity = update.get("sensitivity", UNKNOWN)
+        out += COMPACT_UPDATE.pack(
+            uuid.UUID(update["video_id"]).bytes,
+            progress if progress is not None else UNKNOWN,
+            STATUS_CODES.index(status) if status in STATUS_CODES else UNKNOWN,
+            SENSITIVITY_CODES.index(sensitivity) if sensitivity in SENSITIVITY_CODES else UNKNOWN
+        )
+    return bytes(out)
+
+
+def decode_compact(data: bytes) -> List[dict]:
+    if not data or data[0] != COMPACT_VERSION:
+        raise ValueError("Unsupported video_updates encoding")
+    updates = []
+    for video_id, progress, status, sensitivity in COMPACT_UPDATE.iter_unpack(data[1:]):
+        update = {"video_id": str(uuid.UUID(bytes=video_id))}
+        if progress != UNKNOWN:
+            update["progress"] = progress
+        if status != UNKNOWN:
+            update["status"] = STATUS_CODES[status]
+        if sensitivity != UNKNOWN:
+            update["sensitivity"] = SENSITIVITY_CODES[sensitivity]
+        updates.append(update)
+    return updates
+
+
+class TokenCache:
+    """User (id, role) by access token, so reconnecting sockets skip the JWT check and the user lookup."""
+
+    def __init__(self, ttl: float = 300, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Tuple[str, str]]:
+        entry = self.entries.get(token)
+        if entry and entry[2] > time.monotonic():
+            self.hits += 1
+            return entry[0], entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, user_id: str, role: str, expires_in: Optional[float] = None):
+        """Cache for `ttl` seconds, or until the token expires (`expires_in`) if that is sooner."""
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        self.entries[token] = (user_id, role, time.monotonic() + ttl)
+        self.entries.move_to_end(token)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class UpdateBatcher:
+    """Video updates coalesced per room and sent as one `video_updates` frame per tick.
+
+    Updates to the same video within a tick are merged (later fields win), so
+    a dashboard gets at most one entry per video every `interval` seconds.
+    The first update after an idle period starts the tick, so idle rooms cost
+    nothing. With `encoding="compact"` the frame is a binary attachment (see
+    encode_compact) instead of a JSON list.
+    """
+
+    def __init__(self, sio, interval: float = 0.1, encoding: str = "json"):
+        if encoding not in ("json", "compact"):
+            raise ValueError(f"Unknown encoding {encoding!r}")
+        self.sio = sio
+        self.interval = interval
+        self.encoding = encoding
+        self.pending: Dict[str, Dict[str, dict]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.queued = 0
+        self.sent = 0
+        self.frames = 0
+        self.bytes_sent = 0
+        self.errors = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def queue(self, room: str, update: dict):
+        self.pending.setdefault(room, {}).setdefault(update["video_id"], {}).update(update)
+        self.queued += 1
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._flusher = None
+        await self.flush()
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        started = time.perf_counter()
+        for room, videos in pending.items():
+            updates = list(videos.values())
+            payload = encode_compact(updates) if self.encoding == "compact" else updates
+            try:
+                await self.sio.emit("video_updates", payload, room=room)
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Failed to send video updates to room {room}: {e}")
+                continue
+            self.sent += len(updates)
+            self.frames += 1
+            if self.encoding == "compact":
+                self.bytes_sent += len(payload)
+        self.last_flush_seconds = time.perf_counter() - started
+        self.max_flush_seconds = max(self.max_flush_seconds, self.last_flush_seconds)
+
+    async def close(self):
+        """Send what is pending now instead of at the next tick."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "encoding": self.encoding,
+            "pending_rooms": len(self.pending),
+            "updates_queued": self.queued,
+            "updates_sent": self.sent,
+            "frames_sent": self.frames,
+            "compact_bytes_sent": self.bytes_sent,
+            "errors": self.errors,
+            "last_flush_seconds": round(self.last_flush_seconds, 6),
+            "max_flush_seconds": round(self.max_flush_seconds, 6),
+        }
@@ -0,0 +1,152 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Set
+
+# Rough per-entry bookkeeping cost on top of the body
+ENTRY_OVERHEAD = 256
+
+# Scope of list entries visible to admins (they see every user's videos)
+ALL_USERS = "*"
+
+# Videos and scopes whose last invalidation is remembered exactly
+REMEMBERED_INVALIDATIONS = 10000
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "headers", "owner_id", "scope", "expires_at", "size")
+
+    def __init__(
+        self,
+        body: bytes,
+        owner_id: Optional[str],
+        scope: Optional[str],
+        expires_at: float,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.headers = headers or {}  # sent with the body, and with a 304 for it
+        self.owner_id = owner_id
+        self.scope = scope
+        self.expires_at = expires_at
+        self.size = len(body) + ENTRY_OVERHEAD
+
+
+class ResponseCache:
+    """Serialized video responses with LRU eviction under a byte budget.
+
+    Entries are either a single video (keyed by video id, remembering its
+    owner for permission checks) or a listing for a scope: one user's videos,
+    or ALL_USERS for admins. Changing a video drops its own entry and every
+    listing that could contain it. The TTL only bounds staleness across
+    workers, whose caches are invalidated independently.
+
+    A response computed from reads that started before its video or scope
+    was last invalidated may be stale and is not stored. That is tracked per
+    video and scope, so progress updates on one user's video do not stop
+    other users' responses from being cached.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.scopes: Dict[str, Set[Hashable]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation and read before computing a response.
+        # `invalidated` holds the version of the latest invalidation of each
+        # recently changed video and scope; `forgotten` is the newest one
+        # dropped from it, and stands in for every key it no longer holds.
+        self.version = 0
+        self.invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.forgotten = 0
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        key: Hashable,
+        body: bytes,
+        version: int,
+        owner_id: Optional[str] = None,
+        scope: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> CacheEntry:
+        entry = CacheEntry(body, owner_id, scope, time.monotonic() + self.ttl, headers)
+        changed_at = self.invalidated.get(key if scope is None else scope, self.forgotten)
+        if changed_at > version or entry.size > self.max_bytes:
+            return entry
+
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.bytes += entry.size
+        if scope is not None:
+            self.scopes.setdefault(scope, set()).add(key)
+
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return entry
+
+    def invalidate_video(self, video_id: str, owner_id: str):
+        self.version += 1
+        for changed in (("video", video_id), owner_id, ALL_USERS):
+            self.invalidated[changed] = self.version
+            self.invalidated.move_to_end(changed)
+        while len(self.invalidated) > REMEMBERED_INVALIDATIONS:
+            _, self.forgotten = self.invalidated.popitem(last=False)
+
+        keys = {("video", video_id)}
+        keys |= self.scopes.get(owner_id, set())
+        keys |= self.scopes.get(ALL_USERS, set())
+        for key in keys:
+            if key in self.entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key: Hashable):
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        if entry.scope is not None:
+            keys = self.scopes[entry.scope]
+            keys.discard(key)
+            if not keys:
+                del self.scopes[entry.scope]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header, as used for GET."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
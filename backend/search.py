@@ -0,0 +1,334 @@
+import math
+import re
+from bisect import bisect_left, insort
+from itertools import compress, islice, tee
+from operator import methodcaller
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of a file name, e.g. "My_Trip-2023.mp4" -> my, trip, 2023, mp4."""
+    return list(dict.fromkeys(_TOKEN_RE.findall(text.casefold())))
+
+
+def parse_query(q: str) -> Tuple[List[str], Optional[str]]:
+    """Split a search string into whole terms and a trailing prefix.
+
+    The last word is matched as a prefix (search-as-you-type) unless the
+    query ends with whitespace.
+    """
+    tokens = tokenize(q)
+    if not tokens or q[-1:].isspace():
+        return tokens, None
+    return tokens[:-1], tokens[-1]
+
+
+def mongo_filter(q: str) -> dict:
+    """Query on the `name_tokens` array; anchored regexes use its multikey index."""
+    terms, prefix = parse_query(q)
+    conditions = []
+    if terms:
+        conditions.append({"name_tokens": {"$all": terms}})
+    if prefix:
+        conditions.append({"name_tokens": {"$regex": f"^{re.escape(prefix)}"}})
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+class SortedTokens:
+    """Sorted set of strings kept as a list of bounded buckets.
+
+    Inserts and deletes shift at most one bucket instead of the whole list,
+    which matters once names contain many unique tokens (ids, dates).
+    """
+
+    BUCKET_SIZE = 1000
+
+    def __init__(self):
+        self.buckets: List[List[str]] = []
+        self.maxes: List[str] = []
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets)
+
+    def add(self, token: str):
+        if not self.buckets:
+            self.buckets.append([token])
+            self.maxes.append(token)
+            return
+
+        i = min(bisect_left(self.maxes, token), len(self.buckets) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, token)
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            self.buckets[i:i + 1] = [bucket[:self.BUCKET_SIZE], bucket[self.BUCKET_SIZE:]]
+            self.maxes[i:i + 1] = [bucket[self.BUCKET_SIZE - 1], bucket[-1]]
+
+    def remove(self, token: str):
+        i = bisect_left(self.maxes, token)
+        bucket = self.buckets[i]
+        del bucket[bisect_left(bucket, token)]
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def prefixed(self, prefix: str) -> Iterator[str]:
+        """Tokens starting with `prefix`, in order."""
+        i = bisect_left(self.maxes, prefix)
+        if i == len(self.buckets):
+            return
+        j = bisect_left(self.buckets[i], prefix)
+        for bucket in self.buckets[i:]:
+            for token in bucket[j:]:
+                if not token.startswith(prefix):
+                    return
+                yield token
+            j = 0
+
+
+class NameIndex:
+    """In-memory inverted index over video names with prefix lookup.
+
+    Postings map each token to the ids of videos containing it; a sorted token
+    set answers prefix queries by bisection. Owners and filterable fields
+    (status, sensitivity) are indexed as extra posting lists, so a filtered
+    search only looks at videos that pass every filter. Used when running on
+    MockDB, where there is no database index to lean on.
+
+    Short prefixes can cover tens of thousands of tokens, so for prefixes of
+    up to COUNTED_PREFIX_LENGTH characters the number of tokens and postings
+    under them is kept up to date, and sizing such a prefix costs nothing.
+    """
+
+    COUNTED_PREFIX_LENGTH = 3
+    # Relative costs, in membership tests inside set.intersection (measured
+    # with bench_search.py): checking a walked document against a list and
+    # its name for a prefix, sorting one match by recency, and looking up one
+    # token of an expanded prefix
+    SET_CHECK_COST = 2
+    NAME_CHECK_COST = 3
+    SORT_COST = 6
+    TOKEN_COST = 15
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.tokens = SortedTokens()
+        self.prefix_tokens: Dict[str, int] = {}
+        self.prefix_postings: Dict[str, int] = {}
+        # Each video's tokens as one "\0tok\0tok" string: compact, and a prefix
+        # check is a single substring search. Insertion-ordered, so iterating
+        # in reverse walks the newest videos first.
+        self.docs: Dict[str, str] = {}
+        self.owners: Dict[str, Set[str]] = {}
+        self.doc_owner: Dict[str, Optional[str]] = {}
+        self.fields: Dict[Tuple[str, Any], Set[str]] = {}  # (field, value) -> ids
+        self.doc_fields: Dict[str, Dict[str, Any]] = {}
+        self.seq: Dict[str, int] = {}
+        self._next_seq = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, video_id: str, name: str, owner: Optional[str] = None, **fields):
+        if video_id in self.docs:
+            self.remove(video_id)
+        tokens = tokenize(name)
+        self.docs[video_id] = "".join("\0" + token for token in tokens)
+        self.doc_owner[video_id] = owner
+        self.doc_fields[video_id] = {}
+        self.seq[video_id] = self._next_seq
+        self._next_seq += 1
+        if owner is not None:
+            self.owners.setdefault(owner, set()).add(video_id)
+        self.set_fields(video_id, **fields)
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = {video_id}
+                self.tokens.add(token)
+                self._count_prefixes(self.prefix_tokens, token, 1)
+            else:
+                ids.add(video_id)
+            self._count_prefixes(self.prefix_postings, token, 1)
+
+    def set_fields(self, video_id: str, **fields):
+        """Record new values of filterable fields, e.g. status="completed"."""
+        current = self.doc_fields.get(video_id)
+        if current is None:
+            return
+        for field, value in fields.items():
+            if field in current:
+                self._discard(self.fields, (field, current[field]), video_id)
+            current[field] = value
+            self.fields.setdefault((field, value), set()).add(video_id)
+
+    def remove(self, video_id: str):
+        self.seq.pop(video_id, None)
+        owner = self.doc_owner.pop(video_id, None)
+        if owner is not None:
+            self._discard(self.owners, owner, video_id)
+        for field, value in self.doc_fields.pop(video_id, {}).items():
+            self._discard(self.fields, (field, value), video_id)
+        doc = self.docs.pop(video_id, None)
+        for token in doc.split("\0")[1:] if doc else ():
+            ids = self.postings[token]
+            ids.discard(video_id)
+            self._count_prefixes(self.prefix_postings, token, -1)
+            if not ids:
+                del self.postings[token]
+                self.tokens.remove(token)
+                self._count_prefixes(self.prefix_tokens, token, -1)
+
+    def _count_prefixes(self, counts: Dict[str, int], token: str, delta: int):
+        for length in range(1, min(len(token), self.COUNTED_PREFIX_LENGTH) + 1):
+            prefix = token[:length]
+            count = counts.get(prefix, 0) + delta
+            if count:
+                counts[prefix] = count
+            else:
+                del counts[prefix]
+
+    def _prefix_size(self, prefix: str, limit: float) -> Tuple[int, int]:
+        """Tokens starting with `prefix` and their postings; exact while postings stay under `limit`."""
+        if len(prefix) <= self.COUNTED_PREFIX_LENGTH:
+            return self.prefix_tokens.get(prefix, 0), self.prefix_postings.get(prefix, 0)
+        tokens = postings = 0
+        for token in self.tokens.prefixed(prefix):
+            tokens += 1
+            postings += len(self.postings[token])
+            if postings >= limit:
+                break
+        return tokens, postings
+
+    @staticmethod
+    def _discard(lists: dict, key, video_id: str):
+        ids = lists[key]
+        ids.discard(video_id)
+        if not ids:
+            del lists[key]
+
+    def search(
+        self,
+        q: str,
+        owner: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000
+    ) -> Iterator[List[str]]:
+        """Yield ids of matching videos in batches, most recently added first.
+
+        `filters` are exact field values, e.g. {"status": "failed"}. Posting
+        lists are intersected smallest first with set.intersection, which
+        only walks the smaller side and never copies a whole list. When
+        matches are dense enough that a page fills sooner than that, the
+        newest documents are walked instead, so a caller that only needs one
+        page stops early. A prefix is only expanded into its tokens' posting
+        lists when the intersection needs them.
+        """
+        terms, prefix = parse_query(q)
+        if not terms and not prefix:
+            return
+
+        lists = [self.postings.get(token) for token in terms]
+        if owner is not None:
+            lists.append(self.owners.get(owner))
+        for field, value in (filters or {}).items():
+            lists.append(self.fields.get((field, value)))
+        if not all(lists):
+            return
+        lists.sort(key=len)
+
+        # Expected matches if the conditions are independent, and the cost of
+        # collecting them all versus walking the newest documents until one
+        # page is full
+        total = len(self.docs)
+        sizes = [len(ids) for ids in lists]
+        expected = float(total)
+        for size in sizes:
+            expected *= size / total
+        collect_cost = sizes[0] if sizes else 0
+        # Per document walked: the first list is checked for every one, the
+        # name only for those that pass the lists
+        walk_check = self.SET_CHECK_COST if lists else 0.0
+        marker = None
+        if prefix:
+            marker = "\0" + prefix
+            walk_check += self.NAME_CHECK_COST * (expected / total if lists else 1.0)
+            # The walk wins once the prefix matches `enough` documents (it is
+            # then cheaper than the smallest list, or than the prefix's own
+            # postings), so they are only counted that far
+            page_cost = walk_check * batch_size * total * total / max(expected, 1.0)
+            enough = math.sqrt(page_cost)
+            if sizes:
+                enough = max(enough, page_cost / sizes[0])
+            tokens, matched = self._prefix_size(prefix, min(enough, total))
+            if not matched:
+                return
+            matched = min(matched, total)
+            expand_cost = self.TOKEN_COST * tokens + matched
+            collect_cost += min(self.NAME_CHECK_COST * expected, expand_cost) if lists else expand_cost
+            expected *= matched / total
+
+        walk_cost = walk_check * batch_size * total / max(expected, 1.0)
+        if walk_cost < collect_cost + self._order_cost(expected, batch_size):
+            yield from self._walk_newest(lists, marker, batch_size)
+            return
+
+        # The smallest list itself, only read from; each intersection walks
+        # the smaller side, so the result shrinks without copying the others
+        candidates = lists[0] if lists else None
+        for ids in lists[1:]:
+            candidates = candidates.intersection(ids)
+            if not candidates:
+                return
+        if prefix:
+            if candidates is not None and self.NAME_CHECK_COST * len(candidates) < expand_cost:
+                # Few candidates: cheaper to check each than to visit every expansion
+                candidates = set(self._named(candidates, marker))
+            else:
+                expanded = set().union(*(self.postings[token] for token in self.tokens.prefixed(prefix)))
+                candidates = expanded if candidates is None else candidates.intersection(expanded)
+            if not candidates:
+                return
+
+        if self.SORT_COST * len(candidates) > self._order_cost(len(candidates), batch_size):
+            # Many matches: walking the newest documents finds a page of them
+            # sooner than sorting them all
+            yield from self._walk_newest([candidates], None, batch_size)
+            return
+        found = sorted(candidates, key=self.seq.__getitem__, reverse=True)
+        for start in range(0, len(found), batch_size):
+            yield found[start:start + batch_size]
+
+    def _order_cost(self, matches: float, batch_size: int) -> float:
+        """Cost of the first page of `matches` known ids, newest first."""
+        return min(self.SORT_COST * matches, self.SET_CHECK_COST * batch_size * len(self.docs) / max(matches, 1.0))
+
+    def _walk_newest(self, lists: List[Set[str]], marker: Optional[str], batch_size: int) -> Iterator[List[str]]:
+        """Ids in every one of `lists` whose names contain `marker`, newest first.
+
+        Built from filter() over the insertion-ordered docs, so no Python
+        code runs per document.
+        """
+        ids = reversed(self.docs)
+        for members in lists:
+            ids = filter(members.__contains__, ids)
+        if marker is not None and lists:
+            ids = self._named(ids, marker)
+        elif marker is not None:
+            ids = compress(ids, map(methodcaller("__contains__", marker), reversed(self.docs.values())))
+        while True:
+            batch = list(islice(ids, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _named(self, ids: Iterable[str], marker: str) -> Iterator[str]:
+        """The ids whose names contain `marker` (a "\0prefix" string), checked in C."""
+        ids, keys = tee(ids)
+        return compress(ids, map(methodcaller("__contains__", marker), map(self.docs.__getitem__, keys)))
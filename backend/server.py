@@ -1,75 +1,235 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Header, Depends, status
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, Header, Depends, Query, Request, status
+from fastapi.responses import Response, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter
+from typing import List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import socketio
 import asyncio
 import random
-import aiofiles
 import hashlib
-from passlib.context import CryptContext
-import jwt
-from jwt import PyJWTError
+import time
+import mimetypes
+from profiling import RequestProfiler, ProfilingMiddleware
+from rate_limit import RateLimit, InMemoryRateLimitBackend, MongoRateLimitBackend
+from stream_scheduler import StreamScheduler
+from lifecycle import BackgroundJobs, Readiness, ReadinessGate
+from response_cache import ResponseCache, ALL_USERS, etag_matches
+from storage import StorageManager, MongoUsageTracker
+from stream_urls import StreamSigner
+from block_cache import BlockCache
+from events import EventLog, MongoEventSink, FileEventSink
+from transcode import Transcoder
+from realtime import TokenCache, UpdateBatcher
+import database
+import search
 
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env', override=True)
+# .env wins over the process environment unless DOTENV_OVERRIDE=0, which the
+# bench scripts set so the MONGO_URL they pass is the one used
+load_dotenv(ROOT_DIR / '.env', override=os.environ.get('DOTENV_OVERRIDE', '1') != '0')
 
-# MongoDB connection
+# MongoDB connection (opened per worker on startup, so a preloaded app never
+# shares a client across forked processes)
 mongo_url = os.environ.get('MONGO_URL')
 db_name = os.environ.get('DB_NAME', 'video_sentiment')
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
 
-if mongo_url:
-    try:
-        logging.info(f"Attempting to connect to MongoDB at {mongo_url.split('@')[-1] if '@' in mongo_url else '...'}")
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[db_name]
-        logging.info("Connected to MongoDB")
-    except Exception as e:
-        logging.error(f"Failed to connect to MongoDB: {e}")
-        client = None
-else:
-    client = None
+client = None
+db = None
+read_db = None  # read-heavy endpoints; honours MONGO_READ_PREFERENCE
+name_index = None  # in-memory name search index, only used with MockDB
 
-if not client:
-    logging.warning("Using in-memory MockDB (Data will be lost on restart)")
-    from mock_db import MockDB
-    db = MockDB()
-    client = None # Mock client
+async def connect_db():
+    global client, db, read_db, name_index
+    client, db, read_db = await database.connect(mongo_url, db_name, workers=WEB_CONCURRENCY)
+    name_index = None if client else search.NameIndex()
+    if read_db is not db and read_db.read_preference.mongos_mode != "primary":
+        # A secondary can answer with data older than the last invalidation,
+        # and caching that would keep it for the whole TTL after the
+        # secondary has caught up
+        response_cache.max_bytes = 0
+        logging.info(f"Response cache disabled: MONGO_READ_PREFERENCE is {read_db.read_preference.mongos_mode}")
 
-# Upload directory
+# Upload directory (created on startup)
 UPLOAD_DIR = ROOT_DIR / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Video file storage: per-user quotas (bytes, 0 = unlimited), orphan sweeping
+# and an optional cold tier for videos that haven't been streamed for a while
+storage = StorageManager(
+    hot_dir=UPLOAD_DIR,
+    cold_dir=Path(os.environ["COLD_STORAGE_DIR"]) if os.environ.get("COLD_STORAGE_DIR") else None,
+    quota_bytes=int(os.environ.get("STORAGE_QUOTA_BYTES", str(5 * 1024 ** 3))),
+    cold_after_days=float(os.environ.get("COLD_AFTER_DAYS", "30")),
+    orphan_grace=float(os.environ.get("ORPHAN_GRACE_SECONDS", "3600")),
+    sweep_batch=int(os.environ.get("STORAGE_SWEEP_BATCH", "500"))
+)
+STORAGE_SWEEP_INTERVAL = float(os.environ.get("STORAGE_SWEEP_INTERVAL_SECONDS", "3600"))
+storage_task = None
+
+# Uploads browsers can't play (QuickTime, AVI, ...) are transcoded to H.264/AAC
+# MP4 during processing when ffmpeg is installed. By default each worker gets
+# an equal share of the cores for its segment encoders.
+transcoder = Transcoder(
+    workers=int(os.environ.get("TRANSCODE_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))),
+    segment_seconds=float(os.environ.get("TRANSCODE_SEGMENT_SECONDS", "10")),
+    preset=os.environ.get("TRANSCODE_PRESET", "veryfast"),
+    crf=int(os.environ.get("TRANSCODE_CRF", "23")),
+    ffmpeg=os.environ.get("FFMPEG_PATH", "ffmpeg"),
+    ffprobe=os.environ.get("FFPROBE_PATH", "ffprobe")
+)
+TRANSCODE_WORK_DIR = Path(os.environ.get("TRANSCODE_WORK_DIR", str(UPLOAD_DIR / ".transcode")))
+TRANSCODE_PROGRESS_SHARE = 80  # percent of processing progress spent transcoding
+
+# Per-user rate limits (requests per minute, burst, max concurrent; 0 disables)
+upload_limit = RateLimit(
+    "upload",
+    rate_per_minute=float(os.environ.get("UPLOAD_RATE_PER_MINUTE", "10")),
+    burst=int(os.environ.get("UPLOAD_BURST", "5")),
+    max_concurrent=int(os.environ.get("UPLOAD_MAX_CONCURRENT", "2"))
+)
+stream_limit = RateLimit(
+    "stream",
+    rate_per_minute=float(os.environ.get("STREAM_RATE_PER_MINUTE", "600")),
+    burst=int(os.environ.get("STREAM_BURST", "60")),
+    max_concurrent=int(os.environ.get("STREAM_MAX_CONCURRENT", "4"))
+)
+
+# Swapped for the shared MongoDB backend on startup when RATE_LIMIT_BACKEND=mongo
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+rate_limit_backend = InMemoryRateLimitBackend()
+
+# Stream bandwidth shaping (bytes per second; 0 disables a ceiling)
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", str(64 * 1024)))
+stream_scheduler = StreamScheduler(
+    global_rate=float(os.environ.get("STREAM_GLOBAL_BYTES_PER_SEC", "0")),
+    stream_rate=float(os.environ.get("STREAM_BYTES_PER_SEC", "0")),
+    start_burst=int(os.environ.get("STREAM_START_BURST_BYTES", str(4 * 1024 * 1024)))
+)
+# Recently streamed file blocks kept in memory (per worker; 0 disables)
+block_cache = BlockCache(
+    capacity_bytes=int(os.environ.get("BLOCK_CACHE_BYTES", str(64 * 1024 * 1024))),
+    block_size=int(os.environ.get("BLOCK_CACHE_BLOCK_SIZE", str(256 * 1024)))
+)
+# e.g. "admin:2,editor:1,viewer:1"
+STREAM_ROLE_WEIGHTS = {
+    role: float(weight)
+    for role, weight in (
+        item.split(":") for item in os.environ.get("STREAM_ROLE_WEIGHTS", "").split(",") if item
+    )
+}
+
+# Password hashing. passlib/bcrypt, jwt and aiofiles are imported where they
+# are used: they are only needed once requests arrive, not to start the worker.
+pwd_context = None
+
+def get_pwd_context():
+    global pwd_context
+    if pwd_context is None:
+        from passlib.context import CryptContext
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return pwd_context
 
 # JWT settings
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
-# Socket.IO setup
+# Signed stream URLs (get_video?stream_url=true). The secret defaults to one
+# derived from the JWT secret so every worker verifies the same signatures.
+stream_signer = StreamSigner(
+    secret=os.environ.get("STREAM_URL_SECRET", "").encode() or hashlib.sha256(b"stream-url:" + SECRET_KEY.encode()).digest(),
+    ttl=float(os.environ.get("STREAM_URL_TTL_SECONDS", "3600"))
+)
+
+# Request profiling (admin opt-in, off by default)
+PROFILING_MAX_SECONDS = float(os.environ.get("PROFILING_MAX_SECONDS", "600"))
+profiler = RequestProfiler()
+
+# Background processing jobs, drained on graceful shutdown/reload
+PROCESSING_DRAIN_TIMEOUT = float(os.environ.get("PROCESSING_DRAIN_TIMEOUT", "25"))
+# A running job holds a lease on its video and renews it every third of
+# PROCESSING_LEASE_SECONDS; once a lease expires (the worker was killed, or
+# shutdown interrupted the job) the video is processed again
+PROCESSING_LEASE_SECONDS = float(os.environ.get("PROCESSING_LEASE_SECONDS", "60"))
+background_jobs = BackgroundJobs()
+processing_watchdog_task = None
+
+# Audit events (auth, uploads, deletes, processing), batch-written off the
+# request path to the `events` collection, or to rotating files with MockDB
+EVENT_RETENTION_DAYS = float(os.environ.get("EVENT_RETENTION_DAYS", "30"))
+EVENT_LOG_DIR = Path(os.environ.get("EVENT_LOG_DIR", str(ROOT_DIR / "events")))
+event_log = EventLog(
+    max_queue=int(os.environ.get("EVENT_QUEUE_SIZE", "10000")),
+    batch_size=int(os.environ.get("EVENT_BATCH_SIZE", "500")),
+    flush_interval=float(os.environ.get("EVENT_FLUSH_INTERVAL_SECONDS", "1"))
+)
+
+# Startup state behind /api/health/ready
+readiness = Readiness()
+
+# Serialized get_video/list_videos responses, invalidated when a video changes.
+# Caches are per worker, so the TTL bounds staleness from writes on other workers.
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "30"))
+)
+
+# Socket.IO setup. With several workers, emits are relayed through a message
+# queue (redis://... or amqp://...) so they reach sockets held by other workers.
+socketio_message_queue = os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+if socketio_message_queue and socketio_message_queue.startswith(("redis://", "rediss://")):
+    client_manager = socketio.AsyncRedisManager(socketio_message_queue)
+elif socketio_message_queue:
+    client_manager = socketio.AsyncAioPikaManager(socketio_message_queue)
+else:
+    client_manager = None
+
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
     logger=False,
-    engineio_logger=False
+    engineio_logger=False,
+    client_manager=client_manager
 )
 
+# Sockets authenticate once on connect (tokens are cached so reconnect storms
+# skip the user lookup). Video updates are merged per room and sent as one
+# `video_updates` frame per tick, as a JSON list or (SOCKETIO_ENCODING=compact)
+# a binary attachment.
+socket_tokens = TokenCache(ttl=float(os.environ.get("SOCKETIO_TOKEN_CACHE_TTL_SECONDS", "300")))
+video_updates = UpdateBatcher(
+    sio,
+    interval=float(os.environ.get("SOCKETIO_BATCH_INTERVAL_MS", "100")) / 1000,
+    encoding=os.environ.get("SOCKETIO_ENCODING", "json")
+)
+socket_connections = 0
+
 # Create the main app
 app = FastAPI()
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Change feed: deletions are kept as tombstones for this long; clients with an
+# older watermark must re-fetch the full list. Watermarks trail the query time
+# by CHANGE_FEED_SKEW_SECONDS so writes still in flight are not skipped. GET
+# /videos reads from read_db, so with a secondary read preference keep the
+# skew above the replication lag.
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "7"))
+CHANGE_FEED_SKEW_SECONDS = float(os.environ.get("CHANGE_FEED_SKEW_SECONDS", "2"))
+# GET /videos answers with the watermark to poll the change feed from next
+WATERMARK_HEADER = "X-Changes-Watermark"
+
+# Upper bound on ids per bulk request
+BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", "1000"))
+
 # Define Models
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -108,8 +268,11 @@ class Video(BaseModel):
     sensitivity: Optional[str] = None  # safe, flagged
     upload_progress: int = 0
     processing_progress: int = 0
+    storage_tier: str = "hot"  # hot, moving, cold
+    content_type: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    last_accessed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class VideoResponse(BaseModel):
     id: str
@@ -121,11 +284,31 @@ class VideoResponse(BaseModel):
     sensitivity: Optional[str]
     upload_progress: int
     processing_progress: int
+    content_type: Optional[str] = None
     created_at: str
     updated_at: str
 
+class VideoChanges(BaseModel):
+    videos: List[VideoResponse]
+    deleted: List[str]
+    watermark: str
+    cursor_id: Optional[str] = None  # pass back as after_id with the watermark when has_more
+    has_more: bool = False
+    reset: bool = False
+
+class VideoBatch(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=BATCH_MAX_IDS)
+
+class ProfilingStart(BaseModel):
+    duration_seconds: float = Field(default=60, gt=0)
+    sample_rate: float = Field(default=1.0, gt=0, le=1)
+    route: Optional[str] = None  # e.g. /api/videos/{video_id}/stream
+    interval_ms: float = Field(default=5, ge=1, le=1000)
+
 # Helper functions
 def create_access_token(data: dict):
+    import jwt
+    
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
@@ -133,12 +316,14 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 async def get_current_user(authorization: Optional[str] = Header(None)):
+    import jwt
+    
     if not authorization:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -157,42 +342,195 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
             raise HTTPException(status_code=401, detail="User not found")
         
         return User(**user)
-    except PyJWTError:
+    except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     except Exception:
         raise HTTPException(status_code=401, detail="Authentication failed")
 
+def can_modify_video(user: User, video: dict) -> bool:
+    # Only admins, or editors on their own videos, may delete or re-process
+    return user.role == "admin" or (user.role == "editor" and video["user_id"] == user.id)
+
+def to_video_response(v: dict) -> VideoResponse:
+    return VideoResponse(
+        id=v["id"],
+        filename=v["filename"],
+        original_name=v["original_name"],
+        file_size=v["file_size"],
+        duration=v.get("duration"),
+        status=v["status"],
+        sensitivity=v.get("sensitivity"),
+        upload_progress=v["upload_progress"],
+        processing_progress=v["processing_progress"],
+        content_type=v.get("content_type"),
+        created_at=v["created_at"],
+        updated_at=v["updated_at"]
+    )
+
+video_list_adapter = TypeAdapter(List[VideoResponse])
+
+def feed_watermark(read_started_at: datetime) -> str:
+    """Where the change feed picks up after a read that started at `read_started_at`."""
+    return (read_started_at - timedelta(seconds=CHANGE_FEED_SKEW_SECONDS)).isoformat()
+
+def cached_json(entry, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache", **entry.headers}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+async def record_deletions(videos: List[dict]):
+    now = datetime.now(timezone.utc)
+    await db.video_tombstones.insert_many([
+        {
+            "id": v["id"],
+            "user_id": v["user_id"],
+            "deleted_at": now.isoformat(),
+            "expires_at": now + timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        }
+        for v in videos
+    ])
+
+# Video fields the in-memory name index can filter on
+INDEXED_FIELDS = ("status", "sensitivity")
+
+def index_video_fields(video_id: str, **fields):
+    if name_index is not None:
+        name_index.set_fields(video_id, **fields)
+
+async def search_videos_in_memory(query: dict, q: str, owner: Optional[str], limit: int):
+    # MockDB path: resolve the name search through the in-memory index, newest
+    # matches first, so broad prefixes stop after the first page of results
+    filters = {field: query[field] for field in INDEXED_FIELDS if field in query}
+    videos = []
+    for ids in name_index.search(q, owner=owner, filters=filters, batch_size=limit):
+        videos += await read_db.videos.find({**query, "id": {"$in": ids}}, {"_id": 0}).sort("created_at", -1).to_list(limit)
+        if len(videos) >= limit:
+            break
+    return videos[:limit]
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 # Mock video processing function
-async def process_video(video_id: str, user_id: str, filename: str):
+def processing_lease(owner: str) -> dict:
+    """Fields handing a video's processing to `owner` for PROCESSING_LEASE_SECONDS."""
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=PROCESSING_LEASE_SECONDS)
+    return {"processing_owner": owner, "processing_lease_until": expires_at.isoformat()}
+
+def new_processing_owner() -> str:
+    return f"{os.getpid()}-{uuid.uuid4().hex}"
+
+async def hold_processing_lease(video_id: str, owner: str, job: asyncio.Task):
+    """Renew the lease while `job` runs; cancel it if the lease was lost."""
+    while True:
+        await asyncio.sleep(PROCESSING_LEASE_SECONDS / 3)
+        try:
+            result = await db.videos.update_one(
+                {"id": video_id, "status": "processing", "processing_owner": owner},
+                {"$set": processing_lease(owner)}
+            )
+        except Exception as e:
+            # Keep the job; the next renewal may get through before the lease runs out
+            logging.error(f"Failed to renew the processing lease of video {video_id}: {e}")
+            continue
+        if not result.matched_count:
+            # Deleted, or recovered by another worker after a missed renewal
+            logging.warning(f"Processing of video {video_id} lost its lease; stopping")
+            job.cancel()
+            return
+
+async def report_progress(video_id: str, user_id: str, progress: int, **details):
+    # Update database
+    await db.videos.update_one(
+        {"id": video_id},
+        {
+            "$set": {
+                "processing_progress": progress,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
+        }
+    )
+    response_cache.invalidate_video(video_id, user_id)
+    
+    # Push progress to the owner's dashboards
+    video_updates.queue(user_id, {
+        'video_id': video_id,
+        'progress': progress,
+        'status': 'processing',
+        **details
+    })
+
+async def transcode_video(video_id: str, user_id: str, owner: str) -> bool:
+    """Replace the video's file with a browser-playable MP4 unless it already is one.
+    
+    Returns whether it was transcoded.
+    """
+    video = await db.videos.find_one({"id": video_id}, {"_id": 0})
+    if not video:
+        return False
+    source, _ = storage.locate(video)
+    filename = f"{uuid.uuid4()}.mp4"
+    target = UPLOAD_DIR / filename
+    
+    async def on_progress(done, total):
+        await report_progress(
+            video_id, user_id, done * TRANSCODE_PROGRESS_SHARE // total,
+            stage="transcoding", segments_done=done, segments_total=total
+        )
+    
+    probe = await transcoder.transcode(source, target, TRANSCODE_WORK_DIR, on_progress)
+    if probe is None:
+        return False
+    
+    file_size = (await asyncio.to_thread(os.stat, target)).st_size
+    result = await db.videos.update_one(
+        {"id": video_id, "processing_owner": owner},
+        {
+            "$set": {
+                "filename": filename,
+                "file_size": file_size,
+                "content_type": "video/mp4",
+                "duration": probe.duration or None,
+                "storage_tier": "hot",
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
+        }
+    )
+    if not result.matched_count:
+        # Deleted, or taken over by another worker, while transcoding
+        await asyncio.to_thread(target.unlink, missing_ok=True)
+        return False
+    
+    response_cache.invalidate_video(video_id, user_id)
+    await storage.replace(user_id, video.get("file_size", 0), file_size)
+    storage.stat_cache.invalidate(video_id)
+    block_cache.invalidate(video_id)
+    await asyncio.to_thread(source.unlink, missing_ok=True)
+    event_log.emit("processing.transcoded", user_id=user_id, video_id=video_id, source_size=video.get("file_size", 0), file_size=file_size)
+    return True
+
+async def process_video(video_id: str, user_id: str, filename: str, owner: str):
+    """Process a video whose lease (see processing_lease) `owner` holds."""
+    lease = asyncio.create_task(hold_processing_lease(video_id, owner, asyncio.current_task()))
     try:
-        # Simulate processing with progress updates
-        for progress in range(0, 101, 10):
+        start = 0
+        if transcoder.available and await transcode_video(video_id, user_id, owner):
+            start = TRANSCODE_PROGRESS_SHARE + 10
+        
+        # Simulate analysis with progress updates
+        for progress in range(start, 101, 10):
             await asyncio.sleep(0.5)  # Simulate work
-            
-            # Update database
-            await db.videos.update_one(
-                {"id": video_id},
-                {
-                    "$set": {
-                        "processing_progress": progress,
-                        "updated_at": datetime.now(timezone.utc).isoformat()
-                    }
-                }
-            )
-            
-            # Emit progress via Socket.IO
-            await sio.emit('processing_progress', {
-                'video_id': video_id,
-                'progress': progress,
-                'status': 'processing'
-            }, room=user_id)
+            await report_progress(video_id, user_id, progress)
         
         # Random sensitivity detection (mock)
         sensitivity = random.choice(["safe", "safe", "safe", "flagged"])  # 75% safe, 25% flagged
         
         # Update to completed
-        await db.videos.update_one(
-            {"id": video_id},
+        result = await db.videos.update_one(
+            {"id": video_id, "processing_owner": owner},
             {
                 "$set": {
                     "status": "completed",
@@ -202,18 +540,37 @@ async def process_video(video_id: str, user_id: str, filename: str):
                 }
             }
         )
+        if not result.matched_count:
+            # Deleted, or taken over by another worker
+            return
+        response_cache.invalidate_video(video_id, user_id)
+        index_video_fields(video_id, status="completed", sensitivity=sensitivity)
+        
+        event_log.emit("processing.completed", user_id=user_id, video_id=video_id, sensitivity=sensitivity)
         
-        # Emit completion
-        await sio.emit('processing_complete', {
+        # Push completion
+        video_updates.queue(user_id, {
             'video_id': video_id,
+            'progress': 100,
             'sensitivity': sensitivity,
             'status': 'completed'
-        }, room=user_id)
+        })
         
+    except asyncio.CancelledError:
+        # Shutdown drain timed out, or the lease was lost. The video stays
+        # "processing"; ending the lease now lets recovery restart it right away.
+        logging.warning(f"Processing of video {video_id} interrupted")
+        event_log.emit("processing.interrupted", user_id=user_id, video_id=video_id)
+        await db.videos.update_one(
+            {"id": video_id, "processing_owner": owner},
+            {"$set": {"processing_lease_until": datetime.now(timezone.utc).isoformat()}}
+        )
+        raise
     except Exception as e:
         logging.error(f"Error processing video {video_id}: {e}")
+        event_log.emit("processing.failed", user_id=user_id, video_id=video_id, error=str(e))
         await db.videos.update_one(
-            {"id": video_id},
+            {"id": video_id, "processing_owner": owner},
             {
                 "$set": {
                     "status": "failed",
@@ -221,10 +578,30 @@ async def process_video(video_id: str, user_id: str, filename: str):
                 }
             }
         )
-        await sio.emit('processing_failed', {
+        response_cache.invalidate_video(video_id, user_id)
+        index_video_fields(video_id, status="failed")
+        video_updates.queue(user_id, {
             'video_id': video_id,
             'status': 'failed'
-        }, room=user_id)
+        })
+    finally:
+        lease.cancel()
+
+# Health checks. Liveness: the process is up and serving. Readiness: startup
+# has finished and the worker isn't shutting down, so it can take traffic.
+@api_router.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid()}
+
+@api_router.get("/health/live")
+async def health_live():
+    return {"status": "ok", "pid": os.getpid()}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail=readiness.error or f"Worker is {readiness.state}")
+    return {"status": "ready", "pid": os.getpid(), "startup_seconds": round(readiness.startup_seconds, 3)}
 
 # Auth endpoints
 @api_router.post("/auth/register", response_model=Token)
@@ -247,6 +624,7 @@ async def register(user_data: UserCreate):
         user_dict['created_at'] = user_dict['created_at'].isoformat()
         
         await db.users.insert_one(user_dict)
+        event_log.emit("auth.register", user_id=user.id, role=user.role)
         
         # Create token
         access_token = create_access_token(data={"sub": user.id})
@@ -262,12 +640,15 @@ async def register(user_data: UserCreate):
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
     if not user:
+        event_log.emit("auth.login_failed", email=credentials.email, reason="unknown_email")
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if not verify_password(credentials.password, user['password_hash']):
+        event_log.emit("auth.login_failed", user_id=user["id"], email=credentials.email, reason="wrong_password")
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user_obj = User(**user)
+    event_log.emit("auth.login", user_id=user_obj.id)
     access_token = create_access_token(data={"sub": user_obj.id})
     
     return Token(access_token=access_token, token_type="bearer", user=user_obj)
@@ -276,17 +657,51 @@ async def login(credentials: UserLogin):
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@api_router.get("/storage/usage")
+async def get_storage_usage(current_user: User = Depends(get_current_user)):
+    return {
+        "used_bytes": await storage.usage.usage(current_user.id),
+        "quota_bytes": storage.quota
+    }
+
 # Video endpoints
-@api_router.post("/videos/upload")
-async def upload_video(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
-):
+# Allowed for the multipart framing around the file in an upload's Content-Length
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+@api_router.post("/videos/upload", openapi_extra={
+    "requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["file"],
+        "properties": {"file": {"type": "string", "format": "binary"}}
+    }}}}
+})
+async def upload_video(request: Request, current_user: User = Depends(get_current_user)):
+    # A File() parameter would have FastAPI receive the whole body before
+    # this runs; parsing the form here lets an upload that cannot fit the
+    # quota be turned away first
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit():
+        try:
+            await storage.check_room(current_user.id, int(content_length) - UPLOAD_FORM_OVERHEAD)
+        except HTTPException:
+            event_log.emit("video.upload_rejected", user_id=current_user.id, file_size=int(content_length), reason="quota")
+            raise
+    
+    async with request.form() as form:
+        file = form.get("file")
+        if file is None or isinstance(file, str):
+            raise HTTPException(status_code=422, detail="A video file is required")
+        return await save_upload(file, current_user)
+
+async def save_upload(file: UploadFile, current_user: User):
     # Validate file type
     allowed_types = ['video/mp4', 'video/mpeg', 'video/quicktime', 'video/x-msvideo']
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid file type. Only video files are allowed.")
     
+    # Only uploads that could be stored cost a token
+    await upload_limit.check(rate_limit_backend, current_user.id)
+    
     # Generate unique filename
     file_ext = Path(file.filename).suffix
     unique_filename = f"{uuid.uuid4()}{file_ext}"
@@ -298,17 +713,34 @@ async def upload_video(
         filename=unique_filename,
         original_name=file.filename,
         file_size=0,  # Will update after saving
-        status="uploading"
+        status="uploading",
+        content_type=file.content_type
     )
     
     video_dict = video.model_dump()
     video_dict['created_at'] = video_dict['created_at'].isoformat()
     video_dict['updated_at'] = video_dict['updated_at'].isoformat()
+    video_dict['last_accessed_at'] = video_dict['last_accessed_at'].isoformat()
+    video_dict['name_tokens'] = search.tokenize(video.original_name)
+    # Its bytes are reserved below, so rebuilding usage counters skips it
+    video_dict['usage_counted'] = True
     
-    await db.videos.insert_one(video_dict)
-    
-    # Save file
+    upload_lease = await upload_limit.acquire(rate_limit_backend, current_user.id)
     try:
+        # The multipart body is fully received by now, so its size is known
+        # before anything is written
+        await storage.reserve(current_user.id, file.size)
+        
+        await db.videos.insert_one(video_dict)
+        response_cache.invalidate_video(video.id, current_user.id)
+        if name_index is not None:
+            name_index.add(
+                video.id, video.original_name, owner=current_user.id,
+                status=video.status, sensitivity=video.sensitivity
+            )
+        
+        # Save file
+        import aiofiles
         async with aiofiles.open(file_path, 'wb') as out_file:
             content = await file.read()
             await out_file.write(content)
@@ -316,6 +748,7 @@ async def upload_video(
         file_size = len(content)
         
         # Update video with file size and status
+        owner = new_processing_owner()
         await db.videos.update_one(
             {"id": video.id},
             {
@@ -323,27 +756,55 @@ async def upload_video(
                     "file_size": file_size,
                     "status": "processing",
                     "upload_progress": 100,
+                    **processing_lease(owner),
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }
             }
         )
+        response_cache.invalidate_video(video.id, current_user.id)
+        index_video_fields(video.id, status="processing")
         
         # Start background processing
-        asyncio.create_task(process_video(video.id, current_user.id, unique_filename))
+        background_jobs.spawn(process_video(video.id, current_user.id, unique_filename, owner))
+        event_log.emit("video.uploaded", user_id=current_user.id, video_id=video.id, file_size=file_size, name=file.filename)
         
         return {"video_id": video.id, "message": "Video uploaded successfully"}
     
+    except HTTPException:
+        # Over quota; nothing has been stored yet
+        event_log.emit("video.upload_rejected", user_id=current_user.id, file_size=file.size, reason="quota")
+        raise
     except Exception as e:
         logging.error(f"Error uploading file: {e}")
+        event_log.emit("video.upload_failed", user_id=current_user.id, video_id=video.id, error=str(e))
         await db.videos.delete_one({"id": video.id})
+        response_cache.invalidate_video(video.id, current_user.id)
+        if name_index is not None:
+            name_index.remove(video.id)
+        # Don't leave a partial file behind
+        await asyncio.to_thread(file_path.unlink, missing_ok=True)
+        await storage.release(current_user.id, file.size)
         raise HTTPException(status_code=500, detail="Failed to upload video")
+    finally:
+        await upload_limit.release(rate_limit_backend, current_user.id, upload_lease)
 
 @api_router.get("/videos", response_model=List[VideoResponse])
 async def list_videos(
     status: Optional[str] = None,
     sensitivity: Optional[str] = None,
+    q: Optional[str] = Query(default=None, max_length=200),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
+    scope = ALL_USERS if current_user.role == "admin" else current_user.id
+    cache_key = ("list", scope, status, sensitivity, q)
+    entry = response_cache.get(cache_key)
+    if entry:
+        return cached_json(entry, if_none_match)
+    version = response_cache.version
+    # Taken before the read, and cached with the body it belongs to
+    watermark = feed_watermark(datetime.now(timezone.utc))
+    
     # Build query based on user role
     query = {}
     
@@ -356,30 +817,105 @@ async def list_videos(
     if sensitivity:
         query["sensitivity"] = sensitivity
     
-    videos = await db.videos.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    return [
-        VideoResponse(
-            id=v["id"],
-            filename=v["filename"],
-            original_name=v["original_name"],
-            file_size=v["file_size"],
-            duration=v.get("duration"),
-            status=v["status"],
-            sensitivity=v.get("sensitivity"),
-            upload_progress=v["upload_progress"],
-            processing_progress=v["processing_progress"],
-            created_at=v["created_at"],
-            updated_at=v["updated_at"]
-        )
-        for v in videos
-    ]
+    # Name search: all words must match, the last one as a prefix
+    if q and search.tokenize(q):
+        if name_index is not None:
+            owner = None if current_user.role == "admin" else current_user.id
+            videos = await search_videos_in_memory(query, q, owner, 1000)
+        else:
+            query.update(search.mongo_filter(q))
+            videos = await read_db.videos.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    else:
+        videos = await read_db.videos.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    
+    body = video_list_adapter.dump_json([to_video_response(v) for v in videos])
+    entry = response_cache.put(cache_key, body, version, scope=scope, headers={WATERMARK_HEADER: watermark})
+    return cached_json(entry, if_none_match)
+
+@api_router.get("/videos/changes", response_model=VideoChanges)
+async def list_video_changes(
+    since: datetime,
+    after_id: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    # Videos created/updated and tombstones of videos deleted at or after
+    # `since`, which is a watermark from GET /videos or an earlier page. Pages
+    # resume from (watermark, cursor_id): videos updated at the watermark are
+    # ordered by id, so a page boundary inside a run of equal timestamps
+    # neither repeats nor skips them. Reads go to the primary so a lagging
+    # secondary can't move the watermark past changes it hasn't seen.
+    started_at = datetime.now(timezone.utc)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    
+    # Past tombstone retention deletions may be missing, and a watermark from
+    # the future would skip what happens until then: reload the full list
+    if since < started_at - timedelta(days=TOMBSTONE_RETENTION_DAYS) or since > started_at:
+        return VideoChanges(videos=[], deleted=[], watermark=feed_watermark(started_at), reset=True)
+    
+    since_str = since.astimezone(timezone.utc).isoformat()
+    scope = {} if current_user.role == "admin" else {"user_id": current_user.id}
+    
+    if after_id is None:
+        changed = {"updated_at": {"$gte": since_str}}
+    else:
+        changed = {"$or": [
+            {"updated_at": {"$gt": since_str}},
+            {"updated_at": since_str, "id": {"$gt": after_id}}
+        ]}
+    videos = await db.videos.find(
+        {**scope, **changed}, {"_id": 0}
+    ).sort([("updated_at", 1), ("id", 1)]).to_list(limit + 1)
+    has_more = len(videos) > limit
+    videos = videos[:limit]
+    
+    cursor_id = None
+    if has_more:
+        # Resume from the last returned change
+        watermark = videos[-1]["updated_at"]
+        cursor_id = videos[-1]["id"]
+        tombstone_query = {**scope, "deleted_at": {"$gte": since_str, "$lt": watermark}}
+    else:
+        watermark = max(since_str, feed_watermark(started_at))
+        tombstone_query = {**scope, "deleted_at": {"$gte": since_str}}
+    
+    tombstones = await db.video_tombstones.find(tombstone_query, {"_id": 0, "id": 1}).to_list(None)
+    
+    return VideoChanges(
+        videos=[to_video_response(v) for v in videos],
+        deleted=[t["id"] for t in tombstones],
+        watermark=watermark,
+        cursor_id=cursor_id,
+        has_more=has_more
+    )
 
 @api_router.get("/videos/{video_id}")
 async def get_video(
     video_id: str,
+    stream_url: bool = False,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
+    if stream_url:
+        return await video_with_stream_url(video_id, current_user)
+    
+    entry = response_cache.get(("video", video_id))
+    if not entry:
+        version = response_cache.version
+        video = await read_db.videos.find_one({"id": video_id}, {"_id": 0})
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        body = to_video_response(video).model_dump_json().encode()
+        entry = response_cache.put(("video", video_id), body, version, owner_id=video["user_id"])
+    
+    # Check permissions
+    if current_user.role != "admin" and entry.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return cached_json(entry, if_none_match)
+
+async def load_streamable_video(video_id: str, current_user: User) -> dict:
     video = await db.videos.find_one({"id": video_id}, {"_id": 0})
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
@@ -388,19 +924,30 @@ async def get_video(
     if current_user.role != "admin" and video["user_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return VideoResponse(
-        id=video["id"],
-        filename=video["filename"],
-        original_name=video["original_name"],
-        file_size=video["file_size"],
-        duration=video.get("duration"),
-        status=video["status"],
-        sensitivity=video.get("sensitivity"),
-        upload_progress=video["upload_progress"],
-        processing_progress=video["processing_progress"],
-        created_at=video["created_at"],
-        updated_at=video["updated_at"]
-    )
+    if video["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Video is not ready for streaming")
+    
+    # Remember when the video was last watched (for cold tiering), at most hourly
+    now = datetime.now(timezone.utc)
+    if video.get("last_accessed_at", "") < (now - timedelta(hours=1)).isoformat():
+        await db.videos.update_one({"id": video_id}, {"$set": {"last_accessed_at": now.isoformat()}})
+    
+    return video
+
+async def video_with_stream_url(video_id: str, current_user: User) -> dict:
+    video = await load_streamable_video(video_id, current_user)
+    token, expires = stream_signer.sign(video, current_user.id, current_user.role)
+    return {
+        **to_video_response(video).model_dump(),
+        "stream_url": f"/api/videos/{video_id}/stream/signed?token={token}",
+        "stream_url_expires_at": datetime.fromtimestamp(expires, timezone.utc).isoformat()
+    }
+
+def locate_video_file(video: dict):
+    try:
+        return storage.locate(video)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Video file not found")
 
 @api_router.get("/videos/{video_id}/stream")
 async def stream_video(
@@ -408,52 +955,142 @@ async def stream_video(
     range: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
-    video = await db.videos.find_one({"id": video_id}, {"_id": 0})
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
+    await stream_limit.check(rate_limit_backend, current_user.id)
     
-    # Check permissions
-    if current_user.role != "admin" and video["user_id"] != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    video = await load_streamable_video(video_id, current_user)
+    file_path, file_size = locate_video_file(video)
     
-    if video["status"] != "completed":
-        raise HTTPException(status_code=400, detail="Video is not ready for streaming")
+    return await serve_video_file(video_id, file_path, file_size, range, current_user.id, current_user.role)
+
+@api_router.get("/videos/{video_id}/stream/signed")
+async def stream_video_signed(
+    video_id: str,
+    token: str,
+    range: Optional[str] = Header(None)
+):
+    # The signed token stands in for the JWT, user, video and permission
+    # lookups: nothing here touches the database
+    claims = stream_signer.verify(token, video_id)
+    if not claims:
+        raise HTTPException(status_code=403, detail="Invalid or expired stream URL")
     
-    file_path = UPLOAD_DIR / video["filename"]
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Video file not found")
+    await stream_limit.check(rate_limit_backend, claims["u"])
     
-    file_size = file_path.stat().st_size
+    file_path, file_size = locate_video_file({"id": video_id, "filename": claims["f"], "storage_tier": claims["t"]})
     
-    # Handle range requests for video streaming
-    if range:
-        range_str = range.replace("bytes=", "")
-        start, end = range_str.split("-")
-        start = int(start)
-        end = int(end) if end else file_size - 1
-        
-        async def iterfile():
-            async with aiofiles.open(file_path, mode='rb') as f:
-                await f.seek(start)
-                remaining = end - start + 1
-                while remaining > 0:
-                    chunk_size = min(8192, remaining)
-                    data = await f.read(chunk_size)
-                    if not data:
-                        break
-                    remaining -= len(data)
-                    yield data
-        
-        headers = {
-            'Content-Range': f'bytes {start}-{end}/{file_size}',
-            'Accept-Ranges': 'bytes',
-            'Content-Length': str(end - start + 1),
-            'Content-Type': 'video/mp4',
-        }
+    return await serve_video_file(video_id, file_path, file_size, range, claims["u"], claims["r"])
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single `bytes=` range, or None to send the whole file.
+    
+    Malformed or multi-part ranges are ignored, as RFC 9110 allows; a range
+    that lies entirely past the end of the file gets a 416.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    first, sep, last = spec.partition("-")
+    if not sep or "," in spec:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else file_size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise HTTPException(
+                    status_code=416, detail="Range not satisfiable",
+                    headers={"Content-Range": f"bytes */{file_size}"}
+                )
+            start, end = max(0, file_size - length), file_size - 1
+    except ValueError:
+        return None
+    if start >= file_size:
+        raise HTTPException(
+            status_code=416, detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    if end < start:
+        return None
+    return start, min(end, file_size - 1)
+
+async def serve_video_file(video_id: str, file_path: Path, file_size: int, range: Optional[str], user_id: str, role: str):
+    byte_range = parse_range(range, file_size)
+    
+    # Hold a concurrency slot and a scheduler share until the body has been
+    # sent. Released exactly once: when the body ends or fails, from the
+    # background task if the client went away before it started, or right
+    # here if building the response fails.
+    lease = await stream_limit.acquire(rate_limit_backend, user_id)
+    stream = stream_scheduler.open_stream(
+        weight=STREAM_ROLE_WEIGHTS.get(role, 1.0), playback=(user_id, video_id)
+    )
+    finished = False
+    
+    async def finish_stream():
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        stream.close()
+        await stream_limit.release(rate_limit_backend, user_id, lease)
+    
+    async def iterfile(start, end):
+        # Whole aligned blocks go through the block cache. Chunks are copied
+        # out of the block: the server's transport may keep a chunk it was
+        # given after send() returns, even after the response ends, and the
+        # block's slot is reused once released.
+        try:
+            block_size = block_cache.block_size
+            fd = await asyncio.to_thread(os.open, file_path, os.O_RDONLY)
+            try:
+                position = start
+                while position <= end:
+                    block = await block_cache.read(video_id, file_path.name, fd, position // block_size)
+                    try:
+                        offset = position % block_size
+                        view = block.view[offset:offset + end - position + 1]
+                        if not view:
+                            break
+                        position += len(view)
+                        while view:
+                            chunk, view = view[:STREAM_CHUNK_SIZE], view[STREAM_CHUNK_SIZE:]
+                            await stream.acquire(len(chunk))
+                            yield bytes(chunk)
+                    finally:
+                        block_cache.release(block)
+            finally:
+                os.close(fd)
+        finally:
+            await finish_stream()
+    
+    try:
+        content_type = mimetypes.guess_type(file_path.name)[0] or 'video/mp4'
         
-        return StreamingResponse(iterfile(), status_code=206, headers=headers)
-    else:
-        return FileResponse(file_path, media_type='video/mp4')
+        # Handle range requests for video streaming
+        if byte_range:
+            start, end = byte_range
+            headers = {
+                'Content-Range': f'bytes {start}-{end}/{file_size}',
+                'Accept-Ranges': 'bytes',
+                'Content-Length': str(end - start + 1),
+                'Content-Type': content_type,
+            }
+            
+            return StreamingResponse(iterfile(start, end), status_code=206, headers=headers, background=BackgroundTask(finish_stream))
+        else:
+            headers = {
+                'Accept-Ranges': 'bytes',
+                'Content-Length': str(file_size),
+                'Content-Type': content_type,
+            }
+            
+            return StreamingResponse(iterfile(0, file_size - 1), headers=headers, background=BackgroundTask(finish_stream))
+    except BaseException:
+        await finish_stream()
+        raise
 
 @api_router.delete("/videos/{video_id}")
 async def delete_video(
@@ -465,38 +1102,298 @@ async def delete_video(
         raise HTTPException(status_code=404, detail="Video not found")
     
     # Check permissions (only owner or admin can delete)
-    if current_user.role not in ["admin", "editor"] or (current_user.role == "editor" and video["user_id"] != current_user.id):
+    if not can_modify_video(current_user, video):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Delete file
-    file_path = UPLOAD_DIR / video["filename"]
-    if file_path.exists():
-        file_path.unlink()
-    
-    # Delete from database
+    # Delete from database, then the file (a file left behind is picked up by
+    # the orphan sweep)
     await db.videos.delete_one({"id": video_id})
+    response_cache.invalidate_video(video_id, video["user_id"])
+    await record_deletions([video])
+    await storage.remove([video])
+    block_cache.invalidate(video_id)
+    event_log.emit("video.deleted", user_id=current_user.id, video_id=video_id, owner_id=video["user_id"])
+    if name_index is not None:
+        name_index.remove(video_id)
     
     return {"message": "Video deleted successfully"}
 
+# Bulk video endpoints. Each returns a result per requested id.
+async def load_batch(batch: VideoBatch, collection, projection: dict):
+    ids = list(dict.fromkeys(batch.ids))
+    videos = await collection.find({"id": {"$in": ids}}, projection).to_list(len(ids))
+    return ids, {v["id"]: v for v in videos}
+
+@api_router.post("/videos/batch/status")
+async def batch_video_status(
+    batch: VideoBatch,
+    current_user: User = Depends(get_current_user)
+):
+    ids, videos = await load_batch(batch, read_db.videos, {
+        "_id": 0, "id": 1, "user_id": 1, "status": 1, "sensitivity": 1,
+        "upload_progress": 1, "processing_progress": 1, "updated_at": 1
+    })
+    
+    results = {}
+    for video_id in ids:
+        video = videos.get(video_id)
+        if not video:
+            results[video_id] = {"error": "not_found"}
+        elif current_user.role != "admin" and video["user_id"] != current_user.id:
+            results[video_id] = {"error": "forbidden"}
+        else:
+            results[video_id] = {
+                "status": video["status"],
+                "sensitivity": video.get("sensitivity"),
+                "upload_progress": video["upload_progress"],
+                "processing_progress": video["processing_progress"],
+                "updated_at": video["updated_at"]
+            }
+    
+    return {"results": results}
+
+@api_router.post("/videos/batch/delete")
+async def batch_delete_videos(
+    batch: VideoBatch,
+    current_user: User = Depends(get_current_user)
+):
+    ids, videos = await load_batch(batch, db.videos, {
+        "_id": 0, "id": 1, "user_id": 1, "filename": 1, "file_size": 1, "storage_tier": 1
+    })
+    
+    results = {}
+    allowed = []
+    for video_id in ids:
+        video = videos.get(video_id)
+        if not video:
+            results[video_id] = "not_found"
+        elif not can_modify_video(current_user, video):
+            results[video_id] = "forbidden"
+        else:
+            results[video_id] = "deleted"
+            allowed.append(video)
+    
+    if allowed:
+        await db.videos.delete_many({"id": {"$in": [v["id"] for v in allowed]}})
+        for video in allowed:
+            response_cache.invalidate_video(video["id"], video["user_id"])
+        await record_deletions(allowed)
+        if name_index is not None:
+            for video in allowed:
+                name_index.remove(video["id"])
+        await storage.remove(allowed)
+        for video in allowed:
+            block_cache.invalidate(video["id"])
+            event_log.emit("video.deleted", user_id=current_user.id, video_id=video["id"], owner_id=video["user_id"], batch=True)
+    
+    return {"results": results}
+
+@api_router.post("/videos/batch/reprocess")
+async def batch_reprocess_videos(
+    batch: VideoBatch,
+    current_user: User = Depends(get_current_user)
+):
+    ids, videos = await load_batch(batch, db.videos, {"_id": 0, "id": 1, "user_id": 1, "filename": 1, "status": 1})
+    
+    results = {}
+    allowed = []
+    for video_id in ids:
+        video = videos.get(video_id)
+        if not video:
+            results[video_id] = "not_found"
+        elif not can_modify_video(current_user, video):
+            results[video_id] = "forbidden"
+        elif video["status"] not in ("completed", "failed"):
+            results[video_id] = "busy"
+        else:
+            results[video_id] = "queued"
+            allowed.append(video)
+    
+    if allowed:
+        owner = new_processing_owner()
+        await db.videos.update_many(
+            {"id": {"$in": [v["id"] for v in allowed]}},
+            {
+                "$set": {
+                    "status": "processing",
+                    "sensitivity": None,
+                    "processing_progress": 0,
+                    **processing_lease(owner),
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                }
+            }
+        )
+        for video in allowed:
+            response_cache.invalidate_video(video["id"], video["user_id"])
+            index_video_fields(video["id"], status="processing", sensitivity=None)
+            event_log.emit("video.reprocess", user_id=current_user.id, video_id=video["id"], owner_id=video["user_id"])
+            background_jobs.spawn(process_video(video["id"], video["user_id"], video["filename"], owner))
+    
+    return {"results": results}
+
+# Profiling endpoints (admin only)
+@api_router.post("/admin/profiling/start")
+async def start_profiling(
+    options: ProfilingStart,
+    current_user: User = Depends(get_admin_user)
+):
+    duration = min(options.duration_seconds, PROFILING_MAX_SECONDS)
+    try:
+        profiler.start(
+            duration=duration,
+            sample_rate=options.sample_rate,
+            route=options.route,
+            interval=options.interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logging.info(f"Profiling started by {current_user.id} for {duration}s (route={options.route}, rate={options.sample_rate})")
+    return profiler.status()
+
+@api_router.post("/admin/profiling/stop")
+async def stop_profiling(current_user: User = Depends(get_admin_user)):
+    profiler.stop()
+    return profiler.status()
+
+@api_router.get("/admin/profiling")
+async def get_profiling_status(current_user: User = Depends(get_admin_user)):
+    return profiler.status()
+
+@api_router.get("/admin/profiling/profile", response_class=PlainTextResponse)
+async def download_profile(current_user: User = Depends(get_admin_user)):
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'}
+    )
+
+@api_router.get("/admin/streams/scheduler")
+async def get_stream_scheduler_stats(current_user: User = Depends(get_admin_user)):
+    return stream_scheduler.stats()
+
+@api_router.get("/admin/cache")
+async def get_response_cache_stats(current_user: User = Depends(get_admin_user)):
+    return response_cache.stats()
+
+@api_router.get("/admin/storage")
+async def get_storage_stats(current_user: User = Depends(get_admin_user)):
+    return storage.stats()
+
+@api_router.get("/admin/streams/cache")
+async def get_block_cache_stats(current_user: User = Depends(get_admin_user)):
+    return block_cache.stats()
+
+@api_router.get("/admin/realtime")
+async def get_realtime_stats(current_user: User = Depends(get_admin_user)):
+    return {
+        "connections": socket_connections,
+        "updates": video_updates.stats(),
+        "token_cache": socket_tokens.stats()
+    }
+
+@api_router.get("/admin/transcoding")
+async def get_transcoding_stats(current_user: User = Depends(get_admin_user)):
+    return transcoder.stats()
+
+@api_router.get("/admin/events")
+async def list_events(
+    event_type: Optional[str] = Query(default=None, alias="type"),
+    user_id: Optional[str] = None,
+    video_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    current_user: User = Depends(get_admin_user)
+):
+    # Newest first; naive timestamps are taken as UTC
+    since = since.replace(tzinfo=timezone.utc) if since and since.tzinfo is None else since
+    until = until.replace(tzinfo=timezone.utc) if until and until.tzinfo is None else until
+    filters = {k: v for k, v in (("type", event_type), ("user_id", user_id), ("video_id", video_id)) if v}
+    if not event_log.sink:
+        raise HTTPException(status_code=503, detail="Event log is not ready")
+    return {"events": await event_log.sink.query(since, until, filters, limit)}
+
+@api_router.get("/admin/events/stats")
+async def get_event_stats(current_user: User = Depends(get_admin_user)):
+    return event_log.stats()
+
+@api_router.get("/admin/db/pool")
+async def get_db_pool_stats(current_user: User = Depends(get_admin_user)):
+    if not client:
+        return {"backend": "mockdb"}
+    
+    options = client.options.pool_options
+    return {
+        "backend": "mongodb",
+        "max_pool_size": options.max_pool_size,
+        "min_pool_size": options.min_pool_size,
+        "wait_queue_timeout": options.wait_queue_timeout,
+        "read_preference": read_db.read_preference.name,
+        **database.pool_metrics.snapshot(options.max_pool_size)
+    }
+
 # Socket.IO events
+async def authenticate_socket(token: str) -> Optional[Tuple[str, str]]:
+    cached = socket_tokens.get(token)
+    if cached:
+        return cached
+    
+    import jwt
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    user = await db.users.find_one({"id": payload.get("sub")}, {"_id": 0, "id": 1, "role": 1})
+    if not user:
+        return None
+    socket_tokens.put(token, user["id"], user["role"], expires_in=payload["exp"] - time.time())
+    return user["id"], user["role"]
+
 @sio.event
-async def connect(sid, environ):
-    logging.info(f"Client connected: {sid}")
+async def connect(sid, environ, auth):
+    global socket_connections
+    
+    # The user is resolved once and kept in the session, and the socket joins
+    # the user's room right away
+    if readiness.state != "ready":
+        raise socketio.exceptions.ConnectionRefusedError("Service is not ready")
+    token = auth.get("token") if isinstance(auth, dict) else None
+    user = await authenticate_socket(token) if token else None
+    if user is None:
+        raise socketio.exceptions.ConnectionRefusedError("Not authenticated")
+    
+    user_id, role = user
+    await sio.save_session(sid, {"user_id": user_id, "role": role})
+    await sio.enter_room(sid, user_id)
+    socket_connections += 1
+    logging.debug(f"Client connected: {sid} (user {user_id})")
 
 @sio.event
 async def disconnect(sid):
-    logging.info(f"Client disconnected: {sid}")
+    global socket_connections
+    socket_connections -= 1
+    logging.debug(f"Client disconnected: {sid}")
 
 @sio.event
 async def join_room(sid, data):
-    user_id = data.get('user_id')
-    if user_id:
-        sio.enter_room(sid, user_id)
-        logging.info(f"Client {sid} joined room {user_id}")
+    # Sockets are already in their own room; only admins may watch another user's
+    session = await sio.get_session(sid)
+    user_id = data.get('user_id') if isinstance(data, dict) else None
+    if not user_id or user_id == session["user_id"]:
+        return True
+    if session["role"] != "admin":
+        logging.warning(f"Client {sid} (user {session['user_id']}) may not join room {user_id}")
+        return False
+    await sio.enter_room(sid, user_id)
+    logging.debug(f"Client {sid} joined room {user_id}")
+    return True
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+app.add_middleware(ReadinessGate, readiness=readiness)
+
 # Mount Socket.IO
 socket_app = socketio.ASGIApp(sio, app)
 
@@ -516,6 +1413,7 @@ app.add_middleware(
     allow_origins=allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[WATERMARK_HEADER],
 )
 
 # Configure logging
@@ -530,8 +1428,173 @@ logger.info(f"CORS Origins configured: {allowed_origins}")
 logger.info(f"FRONTEND_URL: {frontend_url}")
 logger.info(f"CORS_ORIGINS: {cors_origins}")
 
+async def ensure_indexes():
+    await db.videos.create_index("id", unique=True)
+    await db.videos.create_index([("updated_at", 1), ("id", 1)])
+    await db.videos.create_index([("user_id", 1), ("updated_at", 1), ("id", 1)])
+    await db.videos.create_index("name_tokens")
+    await db.videos.create_index([("user_id", 1), ("name_tokens", 1)])
+    await db.videos.create_index("filename")
+    await db.videos.create_index("last_accessed_at")
+    await db.videos.create_index([("status", 1), ("processing_lease_until", 1)])
+    await db.video_tombstones.create_index([("user_id", 1), ("deleted_at", 1)])
+    await db.video_tombstones.create_index("deleted_at")
+    await db.video_tombstones.create_index("expires_at", expireAfterSeconds=0)
+
+async def backfill_name_tokens(batch_size: int = 500):
+    # Videos uploaded before name search existed have no name_tokens yet
+    while True:
+        videos = await db.videos.find(
+            {"name_tokens": {"$exists": False}}, {"_id": 0, "id": 1, "original_name": 1}
+        ).to_list(batch_size)
+        if not videos:
+            return
+        for video in videos:
+            await db.videos.update_one(
+                {"id": video["id"]},
+                {"$set": {"name_tokens": search.tokenize(video["original_name"])}}
+            )
+
+async def recover_stale_processing() -> int:
+    """Restart processing of videos whose lease has expired; returns how many."""
+    now = datetime.now(timezone.utc)
+    stale = await db.videos.find(
+        {
+            "status": "processing",
+            "$or": [
+                {"processing_lease_until": {"$lt": now.isoformat()}},
+                # Started before leases existed: judge by the last progress write
+                {
+                    "processing_lease_until": None,
+                    "updated_at": {"$lt": (now - timedelta(seconds=PROCESSING_LEASE_SECONDS)).isoformat()}
+                }
+            ]
+        },
+        {"_id": 0, "id": 1, "user_id": 1, "filename": 1, "processing_owner": 1, "processing_lease_until": 1}
+    ).to_list(None)
+    recovered = 0
+    for video in stale:
+        # Claim it first, so only one worker restarts it
+        owner = new_processing_owner()
+        result = await db.videos.update_one(
+            {
+                "id": video["id"],
+                "status": "processing",
+                "processing_owner": video.get("processing_owner"),
+                "processing_lease_until": video.get("processing_lease_until")
+            },
+            {
+                "$set": {
+                    "processing_progress": 0,
+                    **processing_lease(owner),
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                }
+            }
+        )
+        if not result.modified_count:
+            continue
+        response_cache.invalidate_video(video["id"], video["user_id"])
+        event_log.emit("processing.recovered", user_id=video["user_id"], video_id=video["id"])
+        background_jobs.spawn(process_video(video["id"], video["user_id"], video["filename"], owner))
+        recovered += 1
+    if recovered:
+        logger.warning(f"Restarted processing of {recovered} video(s) whose worker stopped")
+    return recovered
+
+async def processing_watchdog():
+    while True:
+        await asyncio.sleep(PROCESSING_LEASE_SECONDS)
+        try:
+            await recover_stale_processing()
+        except Exception as e:
+            logger.error(f"Stale processing recovery failed: {e}")
+
+async def storage_maintenance():
+    while True:
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL)
+        try:
+            removed = await storage.sweep_orphans(db.videos)
+            moved = await storage.move_cold(db.videos)
+            if removed or moved:
+                logger.info(f"Storage maintenance: removed {removed} orphaned file(s), moved {moved} video(s) to cold storage")
+        except Exception as e:
+            logger.error(f"Storage maintenance failed: {e}")
+
+async def initialize():
+    global rate_limit_backend, storage_task, processing_watchdog_task
+    
+    try:
+        await connect_db()
+        
+        if client:
+            await ensure_indexes()
+            background_jobs.spawn(backfill_name_tokens())
+            # Videos from before cold tiering count as accessed when uploaded
+            await db.videos.update_many(
+                {"last_accessed_at": {"$exists": False}},
+                [{"$set": {"last_accessed_at": "$created_at"}}]
+            )
+            storage.usage = MongoUsageTracker(db.storage_usage)
+            await storage.usage.rebuild(db.videos)
+            event_sink = MongoEventSink(db.events, EVENT_RETENTION_DAYS)
+            await event_sink.ensure_indexes()
+        else:
+            event_sink = FileEventSink(
+                EVENT_LOG_DIR,
+                max_bytes=int(os.environ.get("EVENT_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+                backups=int(os.environ.get("EVENT_LOG_BACKUPS", "5"))
+            )
+        event_log.start(event_sink)
+        await recover_stale_processing()
+        
+        if client and RATE_LIMIT_BACKEND == "mongo":
+            rate_limit_backend = MongoRateLimitBackend(db.rate_limits)
+            await rate_limit_backend.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()} failed to initialize: {e}")
+        readiness.mark_failed(f"Initialization failed: {e}")
+        return
+    
+    processing_watchdog_task = asyncio.create_task(processing_watchdog())
+    if STORAGE_SWEEP_INTERVAL > 0:
+        storage_task = asyncio.create_task(storage_maintenance())
+    
+    readiness.mark_ready()
+    logger.info(f"Worker {os.getpid()} ready after {readiness.startup_seconds:.2f}s")
+
+@app.on_event("startup")
+async def startup_db_client():
+    # Keep this hook fast so the worker starts accepting connections (and
+    # answering liveness checks) right away; the database connection is opened
+    # in the background and other requests get a 503 until it is ready.
+    storage.prepare()
+    if not transcoder.available:
+        logger.warning("ffmpeg/ffprobe not found; videos will be served as uploaded, without transcoding")
+    background_jobs.spawn(initialize())
+    logger.info(f"Worker {os.getpid()} started")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    readiness.mark_draining()
+    profiler.stop()
+    if storage_task:
+        storage_task.cancel()
+    if processing_watchdog_task:
+        processing_watchdog_task.cancel()
+    
+    # In-flight HTTP requests (including streams) and websockets are drained
+    # by the server before shutdown hooks run, for up to CONNECTION_DRAIN_TIMEOUT
+    # under gunicorn; background processing jobs are drained here.
+    if background_jobs.tasks:
+        logger.info(f"Draining {len(background_jobs.tasks)} processing job(s)")
+    interrupted = await background_jobs.drain(PROCESSING_DRAIN_TIMEOUT)
+    if interrupted:
+        logger.warning(f"{interrupted} processing job(s) interrupted after {PROCESSING_DRAIN_TIMEOUT}s; they stay processing and are restarted by a running worker")
+    
+    # Send the last video updates, then flush events: draining may have produced both
+    await video_updates.close()
+    await event_log.stop()
+    
     if client:
         client.close()
 
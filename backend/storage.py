@@ -0,0 +1,348 @@
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+class UsageTracker:
+    """Bytes stored per user, maintained incrementally on upload and delete.
+
+    `reserve` adds `nbytes` unless that would take the user above `quota`
+    (None = no quota) and returns whether it did.
+    """
+
+    async def reserve(self, user_id: str, nbytes: int, quota: Optional[int]) -> bool:
+        raise NotImplementedError
+
+    async def release(self, user_id: str, nbytes: int) -> None:
+        raise NotImplementedError
+
+    async def usage(self, user_id: str) -> int:
+        raise NotImplementedError
+
+
+class InMemoryUsageTracker(UsageTracker):
+    """Per-process tracker, used with MockDB (whose data is per process too)."""
+
+    def __init__(self):
+        self.bytes: Dict[str, int] = {}
+
+    async def reserve(self, user_id, nbytes, quota):
+        used = self.bytes.get(user_id, 0)
+        if quota is not None and used + nbytes > quota:
+            return False
+        self.bytes[user_id] = used + nbytes
+        return True
+
+    async def release(self, user_id, nbytes):
+        self.bytes[user_id] = max(0, self.bytes.get(user_id, 0) - nbytes)
+
+    async def usage(self, user_id):
+        return self.bytes.get(user_id, 0)
+
+
+class MongoUsageTracker(UsageTracker):
+    """Tracker shared by all workers: one counter document per user.
+
+    Uploads reserve their bytes before the video is inserted and mark it
+    `usage_counted`. Counters for videos from before tracking are seeded
+    once by `rebuild`.
+    """
+
+    # Present once the counters have been seeded
+    REBUILT = "__rebuilt__"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def rebuild(self, videos):
+        """Add each user's untracked videos to their counter, once.
+
+        Seeding uses the same $inc as reserve and release, so uploads and
+        deletes running meanwhile (in this or other workers) are not lost.
+        Videos they reserved for are excluded, so nothing counts twice, and
+        the per-user `seeded` flag keeps workers starting together from
+        seeding a user twice.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        if await self.collection.find_one({"_id": self.REBUILT}):
+            return
+        totals = videos.aggregate([
+            {"$match": {"usage_counted": {"$ne": True}}},
+            {"$group": {"_id": "$user_id", "bytes": {"$sum": "$file_size"}}}
+        ])
+        async for total in totals:
+            try:
+                await self.collection.update_one(
+                    {"_id": total["_id"], "seeded": {"$ne": True}},
+                    {"$inc": {"bytes": total["bytes"]}, "$set": {"seeded": True}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Seeded by another worker
+                pass
+        await self.collection.update_one({"_id": self.REBUILT}, {"$set": {"at": datetime.now(timezone.utc).isoformat()}}, upsert=True)
+
+    async def reserve(self, user_id, nbytes, quota):
+        from pymongo.errors import DuplicateKeyError
+
+        query = {"_id": user_id}
+        if quota is not None:
+            if nbytes > quota:
+                return False
+            query["bytes"] = {"$lte": quota - nbytes}
+        try:
+            await self.collection.update_one(query, {"$inc": {"bytes": nbytes}}, upsert=True)
+        except DuplicateKeyError:
+            # The counter exists but has no room left
+            return False
+        return True
+
+    async def release(self, user_id, nbytes):
+        await self.collection.update_one({"_id": user_id}, {"$inc": {"bytes": -nbytes}})
+
+    async def usage(self, user_id):
+        doc = await self.collection.find_one({"_id": user_id})
+        return doc["bytes"] if doc else 0
+
+
+class FileStatCache:
+    """Size of video files by video id, so serving a range needs no stat().
+
+    Entries expire after `ttl` seconds to pick up changes made by other
+    workers; local deletes and tier moves invalidate them directly.
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Path, int, float]]" = OrderedDict()
+
+    def size(self, video_id: str, path: Path) -> int:
+        """File size of `path`; raises FileNotFoundError like os.stat()."""
+        entry = self.entries.get(video_id)
+        now = time.monotonic()
+        if entry and entry[0] == path and entry[2] > now:
+            return entry[1]
+
+        size = os.stat(path).st_size
+        self.entries[video_id] = (path, size, now + self.ttl)
+        self.entries.move_to_end(video_id)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return size
+
+    def invalidate(self, video_id: str):
+        self.entries.pop(video_id, None)
+
+
+class StorageManager:
+    """Video files on disk: per-user quotas, orphan sweeping and a cold tier.
+
+    Files live in `hot_dir` until they haven't been streamed for
+    `cold_after_days`, then move to `cold_dir` (e.g. a cheaper, slower
+    volume); the video's `storage_tier` says where to find it. The orphan
+    sweep walks both directories in batches and removes files that no video
+    refers to once they are older than `orphan_grace` seconds.
+    """
+
+    def __init__(
+        self,
+        hot_dir: Path,
+        cold_dir: Optional[Path] = None,
+        quota_bytes: int = 0,
+        cold_after_days: float = 30,
+        orphan_grace: float = 3600,
+        sweep_batch: int = 500
+    ):
+        self.hot_dir = hot_dir
+        self.cold_dir = cold_dir
+        self.quota = quota_bytes or None
+        self.cold_after = timedelta(days=cold_after_days) if cold_dir and cold_after_days > 0 else None
+        self.orphan_grace = orphan_grace
+        self.sweep_batch = sweep_batch
+        self.usage: UsageTracker = InMemoryUsageTracker()
+        self.stat_cache = FileStatCache()
+        self.orphans_removed = 0
+        self.orphan_bytes_removed = 0
+        self.moved_to_cold = 0
+        self.last_sweep_at = None
+
+    def prepare(self):
+        self.hot_dir.mkdir(exist_ok=True)
+        if self.cold_dir:
+            self.cold_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, video: dict) -> Path:
+        if video.get("storage_tier") == "cold" and self.cold_dir:
+            return self.cold_dir / video["filename"]
+        return self.hot_dir / video["filename"]
+
+    def locate(self, video: dict) -> Tuple[Path, int]:
+        """Path and size of a video's file, from the stat cache when possible.
+
+        Falls back to the cold tier when the file has been moved since `video`
+        was read. Raises FileNotFoundError when it is in neither.
+        """
+        path = self.path(video)
+        try:
+            return path, self.stat_cache.size(video["id"], path)
+        except FileNotFoundError:
+            if not self.cold_dir or path.parent == self.cold_dir:
+                raise
+        path = self.cold_dir / video["filename"]
+        return path, self.stat_cache.size(video["id"], path)
+
+    async def check_room(self, user_id: str, nbytes: int):
+        """Reject early something about `nbytes` big that cannot fit; `reserve` makes the binding check."""
+        if self.quota is not None and await self.usage.usage(user_id) + nbytes > self.quota:
+            raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+    async def reserve(self, user_id: str, nbytes: int):
+        if not await self.usage.reserve(user_id, nbytes, self.quota):
+            raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+    async def release(self, user_id: str, nbytes: int):
+        if nbytes:
+            await self.usage.release(user_id, nbytes)
+
+    async def replace(self, user_id: str, old_bytes: int, new_bytes: int):
+        """Account for a file replaced by a derived one (e.g. transcoded); not held to the quota."""
+        if new_bytes > old_bytes:
+            await self.usage.reserve(user_id, new_bytes - old_bytes, None)
+        else:
+            await self.release(user_id, old_bytes - new_bytes)
+
+    async def remove(self, videos: List[dict], concurrency: int = 32):
+        """Delete the files of removed videos and give their bytes back to the owners."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def remove(video):
+            self.stat_cache.invalidate(video["id"])
+            async with semaphore:
+                try:
+                    await asyncio.to_thread(self.path(video).unlink, missing_ok=True)
+                except OSError as e:
+                    # Left for the orphan sweep
+                    logging.error(f"Failed to remove {self.path(video)}: {e}")
+                await self.release(video["user_id"], video.get("file_size", 0))
+
+        await asyncio.gather(*(remove(video) for video in videos))
+
+    async def sweep_orphans(self, videos, pause: float = 0.05) -> int:
+        """One pass over both tiers; returns the number of files removed."""
+        removed = 0
+        for directory, tier in ((self.hot_dir, "hot"), (self.cold_dir, "cold")):
+            if directory is None or not directory.exists():
+                continue
+            entries = await asyncio.to_thread(os.scandir, directory)
+            try:
+                while True:
+                    scanned, batch = await asyncio.to_thread(self._next_batch, entries)
+                    if not scanned:
+                        break
+                    if batch:
+                        removed += await self._remove_orphans(videos, directory, tier, batch)
+                    await asyncio.sleep(pause)
+            finally:
+                entries.close()
+        self.last_sweep_at = datetime.now(timezone.utc).isoformat()
+        return removed
+
+    def _next_batch(self, entries):
+        # Files older than the grace period among the next `sweep_batch` entries
+        cutoff = time.time() - self.orphan_grace
+        scanned = 0
+        batch = []
+        for entry in itertools.islice(entries, self.sweep_batch):
+            scanned += 1
+            if entry.is_file():
+                stat = entry.stat()
+                if stat.st_mtime < cutoff:
+                    batch.append((entry.name, stat.st_size))
+        return scanned, batch
+
+    async def _remove_orphans(self, videos, directory: Path, tier: str, batch) -> int:
+        names = [name for name, _ in batch]
+        known = await videos.find(
+            {"filename": {"$in": names}}, {"_id": 0, "filename": 1, "storage_tier": 1}
+        ).to_list(len(names))
+        # A file being moved between tiers briefly exists in both
+        owned = {
+            v["filename"] for v in known
+            if v.get("storage_tier", "hot") in (tier, "moving")
+        }
+        removed = 0
+        for name, size in batch:
+            if name in owned:
+                continue
+            try:
+                await asyncio.to_thread((directory / name).unlink, missing_ok=True)
+            except OSError as e:
+                logging.error(f"Failed to remove orphan {directory / name}: {e}")
+                continue
+            logging.info(f"Removed orphaned file {directory / name}")
+            removed += 1
+            self.orphans_removed += 1
+            self.orphan_bytes_removed += size
+        return removed
+
+    async def move_cold(self, videos, limit: int = 100) -> int:
+        """Move videos not streamed for `cold_after_days` to the cold tier."""
+        if not self.cold_after:
+            return 0
+        cutoff = (datetime.now(timezone.utc) - self.cold_after).isoformat()
+        candidates = await videos.find(
+            {
+                "storage_tier": {"$nin": ["cold", "moving"]},
+                "status": {"$in": ["completed", "failed"]},
+                "last_accessed_at": {"$lt": cutoff}
+            },
+            {"_id": 0, "id": 1, "filename": 1, "storage_tier": 1}
+        ).to_list(limit)
+
+        moved = 0
+        for video in candidates:
+            # Claim the video so other workers skip it
+            claim = await videos.update_one(
+                {"id": video["id"], "storage_tier": video.get("storage_tier")},
+                {"$set": {"storage_tier": "moving"}}
+            )
+            if not claim.modified_count:
+                continue
+            source = self.hot_dir / video["filename"]
+            target = self.cold_dir / video["filename"]
+            try:
+                # Copy first so streams reading the hot file are not cut off
+                await asyncio.to_thread(shutil.copyfile, source, target)
+            except OSError as e:
+                logging.error(f"Failed to move {source} to cold storage: {e}")
+                await videos.update_one({"id": video["id"]}, {"$set": {"storage_tier": "hot"}})
+                continue
+            await videos.update_one({"id": video["id"]}, {"$set": {"storage_tier": "cold"}})
+            self.stat_cache.invalidate(video["id"])
+            await asyncio.to_thread(source.unlink, missing_ok=True)
+            moved += 1
+            self.moved_to_cold += 1
+        return moved
+
+    def stats(self) -> dict:
+        return {
+            "hot_dir": str(self.hot_dir),
+            "cold_dir": str(self.cold_dir) if self.cold_dir else None,
+            "quota_bytes": self.quota,
+            "cold_after_days": self.cold_after.days if self.cold_after else None,
+            "orphans_removed": self.orphans_removed,
+            "orphan_bytes_removed": self.orphan_bytes_removed,
+            "moved_to_cold": self.moved_to_cold,
+            "last_sweep_at": self.last_sweep_at,
+        }
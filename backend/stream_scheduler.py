@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class Playback:
+    """Token bucket for one viewer watching one video, shared by its range requests.
+
+    Playback start gets `start_burst` bytes before the per-stream ceiling
+    applies. The burst is spent once: what has been sent comes off it, so
+    seeking or pausing and resuming does not earn a new one.
+    """
+
+    def __init__(self, start_burst: int):
+        self.tokens = float(start_burst)
+        self.burst_left = float(start_burst)
+        self.updated_at = time.monotonic()
+        self.last_used = self.updated_at
+
+
+class StreamHandle:
+    """Per-request state: weight, WFQ finish tag and the playback's token bucket."""
+
+    def __init__(self, scheduler: "StreamScheduler", weight: float, playback: Playback):
+        self.scheduler = scheduler
+        self.weight = weight
+        self.playback = playback
+        self.last_finish = 0.0
+        self.bytes_sent = 0
+
+    async def acquire(self, nbytes: int):
+        await self.scheduler.acquire(self, nbytes)
+
+    def close(self):
+        self.scheduler.close_stream(self)
+
+
+class StreamScheduler:
+    """Shares read bandwidth across active streams.
+
+    Each chunk first waits on its playback's byte-rate ceiling, then queues
+    for the global budget ordered by weighted fair queueing finish tags, so
+    streams with equal weights get equal shares when the global ceiling is
+    the bottleneck. Rates are bytes per second; 0 means unlimited. A
+    playback's bucket outlives its range requests and is forgotten
+    `playback_ttl` seconds after the last one.
+    """
+
+    def __init__(self, global_rate: float = 0, stream_rate: float = 0, start_burst: int = 0, playback_ttl: float = 300):
+        self.global_rate = global_rate
+        self.stream_rate = stream_rate
+        self.start_burst = start_burst
+        self.playback_ttl = playback_ttl
+
+        self.active_streams = 0
+        self.playbacks: "OrderedDict[Hashable, Playback]" = OrderedDict()  # least recently used first
+        self._virtual_time = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._tokens = 0.0
+        self._updated_at = time.monotonic()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.chunks = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self.avg_queue_delay = 0.0  # exponentially weighted
+
+    def open_stream(self, weight: float = 1.0, playback: Optional[Hashable] = None) -> StreamHandle:
+        """A handle for one response; requests with the same `playback` key share a bucket."""
+        now = time.monotonic()
+        while self.playbacks:
+            key, oldest = next(iter(self.playbacks.items()))
+            if now - oldest.last_used < self.playback_ttl:
+                break
+            del self.playbacks[key]
+
+        if playback is None:
+            bucket = Playback(self.start_burst)
+        else:
+            bucket = self.playbacks.get(playback)
+            if bucket is None:
+                bucket = self.playbacks[playback] = Playback(self.start_burst)
+            bucket.last_used = now
+            self.playbacks.move_to_end(playback)
+        self.active_streams += 1
+        return StreamHandle(self, weight, bucket)
+
+    def close_stream(self, stream: StreamHandle):
+        self.active_streams -= 1
+
+    async def acquire(self, stream: StreamHandle, nbytes: int):
+        if self.stream_rate > 0:
+            await self._wait_stream_tokens(stream.playback, nbytes)
+
+        if self.global_rate > 0:
+            # Queueing delay is the wait for the global budget only; the
+            # per-stream ceiling above is a deliberate limit, not congestion
+            enqueued_at = time.monotonic()
+            start = max(self._virtual_time, stream.last_finish)
+            stream.last_finish = start + nbytes / stream.weight
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (stream.last_finish, next(self._seq), start, nbytes, future))
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            await future
+            self._record_delay(time.monotonic() - enqueued_at)
+
+        stream.bytes_sent += nbytes
+        stream.playback.last_used = time.monotonic()
+
+    async def _wait_stream_tokens(self, playback: Playback, nbytes: int):
+        while True:
+            now = time.monotonic()
+            # Idle time refills at most one chunk once the start burst is spent
+            ceiling = max(playback.burst_left, float(nbytes))
+            playback.tokens = min(ceiling, playback.tokens + (now - playback.updated_at) * self.stream_rate)
+            playback.updated_at = now
+            if playback.tokens >= nbytes:
+                playback.tokens -= nbytes
+                playback.burst_left = max(0.0, playback.burst_left - nbytes)
+                return
+            await asyncio.sleep((nbytes - playback.tokens) / self.stream_rate)
+
+    async def _dispatch(self):
+        while self._queue:
+            now = time.monotonic()
+            # Allow at most a quarter second of global burst
+            self._tokens = min(self.global_rate / 4, self._tokens + (now - self._updated_at) * self.global_rate)
+            self._updated_at = now
+
+            finish, _, start, nbytes, future = self._queue[0]
+            if future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+            if self._tokens < nbytes and self._tokens < self.global_rate / 4:
+                await asyncio.sleep((min(nbytes, self.global_rate / 4) - self._tokens) / self.global_rate)
+                continue
+
+            heapq.heappop(self._queue)
+            self._tokens -= nbytes
+            self._virtual_time = start
+            future.set_result(None)
+
+    def _record_delay(self, delay: float):
+        self.chunks += 1
+        self.total_queue_delay += delay
+        self.max_queue_delay = max(self.max_queue_delay, delay)
+        self.avg_queue_delay += 0.05 * (delay - self.avg_queue_delay)
+
+    def stats(self) -> dict:
+        return {
+            "global_rate": self.global_rate,
+            "stream_rate": self.stream_rate,
+            "start_burst": self.start_burst,
+            "active_streams": self.active_streams,
+            "playbacks": len(self.playbacks),
+            "queued_chunks": len(self._queue),
+            "chunks": self.chunks,
+            "avg_queue_delay_ms": round(self.avg_queue_delay * 1000, 3),
+            "mean_queue_delay_ms": round(self.total_queue_delay / self.chunks * 1000, 3) if self.chunks else 0.0,
+            "max_queue_delay_ms": round(self.max_queue_delay * 1000, 3),
+        }
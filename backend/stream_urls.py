@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional, Tuple
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class StreamSigner:
+    """HMAC-signed, expiring grants to stream one video file.
+
+    A token carries everything the stream handler needs (video id, filename,
+    storage tier, user and role, expiry), so checking it is a hash and a
+    compare with no database lookups.
+    """
+
+    def __init__(self, secret: bytes, ttl: float):
+        self.secret = secret
+        self.ttl = ttl
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def sign(self, video: dict, user_id: str, role: str) -> Tuple[str, int]:
+        expires = int(time.time() + self.ttl)
+        payload = _b64encode(json.dumps({
+            "v": video["id"],
+            "f": video["filename"],
+            "t": video.get("storage_tier", "hot"),
+            "u": user_id,
+            "r": role,
+            "e": expires,
+        }, separators=(",", ":")).encode())
+        return f"{payload}.{self._sign(payload)}", expires
+
+    def verify(self, token: str, video_id: str) -> Optional[dict]:
+        """Claims of a valid, unexpired token for `video_id`, else None."""
+        payload, _, signature = token.partition(".")
+        if not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        if claims.get("v") != video_id or claims.get("e", 0) < time.time():
+            return None
+        return claims
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+# What browsers play natively in an MP4 container
+PLAYABLE_VIDEO_CODECS = {"h264"}
+PLAYABLE_AUDIO_CODECS = {"aac", "mp3"}
+PLAYABLE_PIXEL_FORMATS = {"yuv420p", "yuvj420p"}
+
+
+class TranscodeError(Exception):
+    pass
+
+
+class Probe:
+    """What ffprobe reports about a source file."""
+
+    def __init__(self, data: dict):
+        streams = data.get("streams", [])
+        self.video = next((s for s in streams if s.get("codec_type") == "video"), None)
+        self.audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+        self.duration = float(data.get("format", {}).get("duration") or 0)
+
+
+class Transcoder:
+    """Converts uploads to H.264/AAC MP4, in parallel GOP-aligned segments.
+
+    The source is cut at keyframes into segments of about `segment_seconds`;
+    each segment's video is encoded by its own ffmpeg process and the audio
+    by one more, then the pieces are joined with the concat demuxer (no
+    re-encode). Segment jobs from all videos share one semaphore, so at most
+    `workers` encoders run at a time and a long video uses every core.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        segment_seconds: float = 10,
+        preset: str = "veryfast",
+        crf: int = 23,
+        ffmpeg: str = "ffmpeg",
+        ffprobe: str = "ffprobe"
+    ):
+        self.workers = max(1, workers)
+        self.segment_seconds = segment_seconds
+        self.preset = preset
+        self.crf = crf
+        self.ffmpeg = shutil.which(ffmpeg)
+        self.ffprobe = shutil.which(ffprobe)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.running = 0
+        self.transcoded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.segments_encoded = 0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.ffmpeg and self.ffprobe)
+
+    async def _run(self, *args: str) -> bytes:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise TranscodeError(f"{Path(args[0]).name} exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+        return stdout
+
+    async def probe(self, path: Path) -> Probe:
+        output = await self._run(
+            self.ffprobe, "-v", "error", "-print_format", "json",
+            "-show_format", "-show_streams", str(path)
+        )
+        return Probe(json.loads(output))
+
+    def playable(self, path: Path, probe: Probe) -> bool:
+        """Whether browsers can play the file as it is."""
+        return (
+            path.suffix.lower() == ".mp4"
+            and probe.video is not None
+            and probe.video.get("codec_name") in PLAYABLE_VIDEO_CODECS
+            and probe.video.get("pix_fmt") in PLAYABLE_PIXEL_FORMATS
+            and (probe.audio is None or probe.audio.get("codec_name") in PLAYABLE_AUDIO_CODECS)
+        )
+
+    async def keyframes(self, path: Path) -> List[float]:
+        # Packet flags need no decoding, so this is fast even for long files
+        output = await self._run(
+            self.ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(path)
+        )
+        times = []
+        for line in output.decode().splitlines():
+            pts, _, flags = line.partition(",")
+            if "K" in flags and pts not in ("", "N/A"):
+                times.append(float(pts))
+        return sorted(times)
+
+    def plan(self, keyframes: List[float], duration: float) -> List[Tuple[float, Optional[float]]]:
+        """(start, length) of each segment; every start is a keyframe, the last length is None (to the end)."""
+        starts = [keyframes[0] if keyframes else 0.0]
+        for t in keyframes:
+            if t - starts[-1] >= self.segment_seconds and duration - t >= self.segment_seconds / 2:
+                starts.append(t)
+        ends = starts[1:] + [None]
+        return [(start, end - start if end is not None else None) for start, end in zip(starts, ends)]
+
+    async def _encode_segment(self, source: Path, start: float, length: Optional[float], target: Path, threads: int):
+        args = [self.ffmpeg, "-nostdin", "-v", "error", "-ss", f"{start:.6f}", "-i", str(source)]
+        if length is not None:
+            args += ["-t", f"{length:.6f}"]
+        args += [
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf),
+            "-pix_fmt", "yuv420p", "-threads", str(threads),
+            "-f", "mpegts", str(target)
+        ]
+        async with self.slots:
+            self.running += 1
+            try:
+                await self._run(*args)
+            finally:
+                self.running -= 1
+        self.segments_encoded += 1
+
+    async def _encode_audio(self, source: Path, target: Path):
+        async with self.slots:
+            self.running += 1
+            try:
+                await self._run(
+                    self.ffmpeg, "-nostdin", "-v", "error", "-i", str(source),
+                    "-map", "0:a:0", "-vn", "-sn", "-dn", "-c:a", "aac", "-b:a", "128k", str(target)
+                )
+            finally:
+                self.running -= 1
+
+    async def transcode(
+        self,
+        source: Path,
+        target: Path,
+        work_dir: Path,
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> Optional[Probe]:
+        """Write a playable MP4 of `source` to `target`.
+
+        Returns None, writing nothing, when `source` already plays in browsers;
+        otherwise the source's Probe. `on_progress(done, total)` is awaited as
+        segments finish.
+        """
+        probe = await self.probe(source)
+        if probe.video is None:
+            raise TranscodeError("No video stream found")
+        if self.playable(source, probe):
+            self.skipped += 1
+            return None
+
+        work_dir.mkdir(parents=True, exist_ok=True)
+        work = Path(await asyncio.to_thread(tempfile.mkdtemp, dir=work_dir))
+        finished = False
+        try:
+            segments = self.plan(await self.keyframes(source), probe.duration)
+            # Spread the cores over the segments when there are fewer segments than workers
+            threads = max(1, (os.cpu_count() or 1) // min(len(segments), self.workers))
+            names = [work / f"segment_{i:05d}.ts" for i in range(len(segments))]
+            done = 0
+
+            async def encode(i):
+                nonlocal done
+                start, length = segments[i]
+                await self._encode_segment(source, start, length, names[i], threads)
+                done += 1
+                if on_progress:
+                    await on_progress(done, len(segments))
+
+            jobs = [encode(i) for i in range(len(segments))]
+            audio = work / "audio.m4a"
+            if probe.audio is not None:
+                jobs.append(self._encode_audio(source, audio))
+            await _gather_or_cancel(jobs)
+
+            playlist = work / "segments.txt"
+            playlist.write_text("".join(f"file '{name.name}'\n" for name in names))
+            args = [self.ffmpeg, "-nostdin", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(playlist)]
+            if probe.audio is not None:
+                args += ["-i", str(audio), "-map", "0:v:0", "-map", "1:a:0"]
+            args += ["-c", "copy", "-movflags", "+faststart", "-y", str(target)]
+            await self._run(*args)
+            finished = True
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            await asyncio.to_thread(shutil.rmtree, work, ignore_errors=True)
+            if not finished:
+                await asyncio.to_thread(target.unlink, missing_ok=True)
+
+        self.transcoded += 1
+        logging.info(f"Transcoded {source.name} in {len(segments)} segment(s)")
+        return probe
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "workers": self.workers,
+            "segment_seconds": self.segment_seconds,
+            "running": self.running,
+            "transcoded": self.transcoded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "segments_encoded": self.segments_encoded,
+        }
+
+
+async def _gather_or_cancel(jobs):
+    # Like gather(), but a failure stops the other encoders instead of letting them run on
+    tasks = [asyncio.ensure_future(job) for job in jobs]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
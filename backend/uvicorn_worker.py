@@ -0,0 +1,49 @@
+import os
+import sys
+
+from gunicorn.arbiter import Arbiter
+from uvicorn import Server
+from uvicorn.workers import UvicornWorker
+
+# Must match the app's; see server.py
+PROCESSING_DRAIN_TIMEOUT = float(os.environ.get("PROCESSING_DRAIN_TIMEOUT", "25"))
+# Left for flushing video updates and audit events after the processing drain
+FLUSH_MARGIN_SECONDS = 2
+
+
+class DrainingServer(Server):
+    """Reports the worker as draining on the first shutdown signal.
+
+    Uvicorn only runs the app's shutdown hook once connections have closed,
+    which is too late for /api/health/ready to tell the load balancer.
+    """
+
+    def handle_exit(self, sig, frame):
+        if not self.should_exit:
+            from server import readiness
+            readiness.mark_draining()
+        super().handle_exit(sig, frame)
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    """Uvicorn worker that fits its whole shutdown into gunicorn's graceful_timeout.
+
+    Open streams and dashboard websockets get what is left of
+    `graceful_timeout` after PROCESSING_DRAIN_TIMEOUT and the flush margin;
+    without a limit they would hold up the shutdown hook until gunicorn
+    SIGKILLs the worker, and nothing would be drained.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = max(
+            1, int(self.cfg.graceful_timeout - PROCESSING_DRAIN_TIMEOUT - FLUSH_MARGIN_SECONDS)
+        )
+
+    async def _serve(self):
+        self.config.app = self.wsgi
+        server = DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
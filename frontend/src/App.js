@@ -48,13 +48,14 @@ function App() {
 
   useEffect(() => {
     if (user && token) {
+      // The server authenticates the socket once and joins it to the user's room
       const newSocket = io(BACKEND_URL, {
-        transports: ['websocket', 'polling']
+        transports: ['websocket', 'polling'],
+        auth: { token }
       });
 
       newSocket.on('connect', () => {
         console.log('Socket connected');
-        newSocket.emit('join_room', { user_id: user.id });
       });
 
       setSocket(newSocket);
@@ -1,4 +1,4 @@
-import { useRef, useEffect } from 'react';
+import { useRef, useEffect, useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
@@ -9,12 +9,55 @@ const API = `${BACKEND_URL}/api`;
 
 export default function VideoPlayer({ video, token, onClose }) {
   const videoRef = useRef(null);
+  const [streamUrl, setStreamUrl] = useState(null);
+  const resumeAt = useRef(0);
+  const retries = useRef(0);
+
+  // The <video> element can't send an Authorization header, so ask for a
+  // signed, short-lived stream URL instead
+  const fetchStreamUrl = async () => {
+    try {
+      const response = await fetch(`${API}/videos/${video.id}?stream_url=true`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setStreamUrl(`${BACKEND_URL}${data.stream_url}`);
+      }
+    } catch (error) {
+      console.error('Failed to get stream URL:', error);
+    }
+  };
 
   useEffect(() => {
-    if (videoRef.current) {
+    resumeAt.current = 0;
+    retries.current = 0;
+    setStreamUrl(null);
+    fetchStreamUrl();
+  }, [video.id]);
+
+  useEffect(() => {
+    if (videoRef.current && streamUrl) {
       videoRef.current.load();
     }
-  }, [video]);
+  }, [streamUrl]);
+
+  const handleError = () => {
+    // Most likely the URL expired mid-playback: get a new one and resume
+    if (retries.current >= 2) return;
+    retries.current += 1;
+    if (videoRef.current) {
+      resumeAt.current = videoRef.current.currentTime;
+    }
+    fetchStreamUrl();
+  };
+
+  const handleLoadedMetadata = () => {
+    retries.current = 0;
+    if (videoRef.current && resumeAt.current) {
+      videoRef.current.currentTime = resumeAt.current;
+    }
+  };
 
   const getSensitivityColor = (sensitivity) => {
     return sensitivity === 'safe' 
@@ -48,11 +91,15 @@ export default function VideoPlayer({ video, token, onClose }) {
               controls
               className="w-full h-full"
               data-testid="video-element"
+              onLoadedMetadata={handleLoadedMetadata}
             >
-              <source
-                src={`${API}/videos/${video.id}/stream`}
-                type="video/mp4"
-              />
+              {streamUrl && (
+                <source
+                  src={streamUrl}
+                  type="video/mp4"
+                  onError={handleError}
+                />
+              )}
               Your browser does not support the video tag.
             </video>
           </div>
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent } from '@/components/ui/card';
 import { Progress } from '@/components/ui/progress';
@@ -15,6 +15,30 @@ import VideoPlayer from '../components/VideoPlayer';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000';
 const API = `${BACKEND_URL}/api`;
 
+const STATUS_CODES = ['uploading', 'processing', 'completed', 'failed'];
+const SENSITIVITY_CODES = [null, 'safe', 'flagged'];
+
+// `video_updates` frames are a JSON list, or with SOCKETIO_ENCODING=compact a
+// binary frame: a version byte, then 19 bytes per update (video id, progress,
+// status, sensitivity; 255 = not included)
+const decodeUpdates = (payload) => {
+  if (Array.isArray(payload)) return payload;
+  const bytes = new Uint8Array(payload);
+  const updates = [];
+  for (let offset = 1; offset + 19 <= bytes.length; offset += 19) {
+    const hex = Array.from(bytes.subarray(offset, offset + 16), b => b.toString(16).padStart(2, '0')).join('');
+    const [progress, status, sensitivity] = bytes.subarray(offset + 16, offset + 19);
+    const update = {
+      video_id: `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`
+    };
+    if (progress !== 255) update.progress = progress;
+    if (status !== 255) update.status = STATUS_CODES[status];
+    if (sensitivity !== 255) update.sensitivity = SENSITIVITY_CODES[sensitivity];
+    updates.push(update);
+  }
+  return updates;
+};
+
 export default function Dashboard({ user, token, socket, onLogout }) {
   const [videos, setVideos] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -22,43 +46,41 @@ export default function Dashboard({ user, token, socket, onLogout }) {
   const [selectedVideo, setSelectedVideo] = useState(null);
   const [filterStatus, setFilterStatus] = useState('all');
   const [sidebarOpen, setSidebarOpen] = useState(true);
+  const [searchQuery, setSearchQuery] = useState('');
+  // Change-feed watermark: refreshes only fetch what changed after it
+  const watermark = useRef(null);
 
   useEffect(() => {
-    fetchVideos();
-  }, [filterStatus]);
+    // Debounce search-as-you-type
+    const timer = setTimeout(fetchVideos, searchQuery ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [filterStatus, searchQuery]);
 
   useEffect(() => {
     if (socket) {
-      socket.on('processing_progress', (data) => {
-        setVideos(prev => prev.map(v =>
-          v.id === data.video_id
-            ? { ...v, processing_progress: data.progress, status: data.status }
-            : v
-        ));
-      });
-
-      socket.on('processing_complete', (data) => {
-        setVideos(prev => prev.map(v =>
-          v.id === data.video_id
-            ? { ...v, status: data.status, sensitivity: data.sensitivity, processing_progress: 100 }
-            : v
-        ));
-        toast.success('Video processing completed!');
-      });
-
-      socket.on('processing_failed', (data) => {
-        setVideos(prev => prev.map(v =>
-          v.id === data.video_id
-            ? { ...v, status: 'failed' }
-            : v
-        ));
-        toast.error('Video processing failed');
+      // One frame per tick with the latest state of every video that changed
+      socket.on('video_updates', (payload) => {
+        const updates = decodeUpdates(payload);
+        const byId = new Map(updates.map(u => [u.video_id, u]));
+        setVideos(prev => prev.map(v => {
+          const u = byId.get(v.id);
+          if (!u) return v;
+          return {
+            ...v,
+            ...(u.status !== undefined && { status: u.status }),
+            ...(u.progress !== undefined && { processing_progress: u.progress }),
+            ...(u.sensitivity !== undefined && { sensitivity: u.sensitivity })
+          };
+        }));
+
+        updates.forEach(u => {
+          if (u.status === 'completed') toast.success('Video processing completed!');
+          else if (u.status === 'failed') toast.error('Video processing failed');
+        });
       });
 
       return () => {
-        socket.off('processing_progress');
-        socket.off('processing_complete');
-        socket.off('processing_failed');
+        socket.off('video_updates');
       };
     }
   }, [socket]);
@@ -68,6 +90,7 @@ export default function Dashboard({ user, token, socket, onLogout }) {
       let url = `${API}/videos`;
       const params = new URLSearchParams();
       if (filterStatus !== 'all') params.append('status', filterStatus);
+      if (searchQuery.trim()) params.append('q', searchQuery);
       if (params.toString()) url += `?${params.toString()}`;
 
       const response = await fetch(url, {
@@ -77,6 +100,8 @@ export default function Dashboard({ user, token, socket, onLogout }) {
       if (response.ok) {
         const data = await response.json();
         setVideos(data);
+        // The server's clock, taken before the list was read
+        watermark.current = response.headers.get('X-Changes-Watermark');
       }
     } catch (error) {
       console.error('Failed to fetch videos:', error);
@@ -86,9 +111,42 @@ export default function Dashboard({ user, token, socket, onLogout }) {
     }
   };
 
+  const refreshVideos = async () => {
+    // Changed videos can't be matched against a search locally
+    if (!watermark.current || searchQuery.trim()) return fetchVideos();
+
+    try {
+      let changes;
+      let afterId = null;
+      do {
+        const params = new URLSearchParams({ since: watermark.current });
+        if (afterId) params.set('after_id', afterId);
+        const response = await fetch(`${API}/videos/changes?${params.toString()}`, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!response.ok) return fetchVideos();
+
+        changes = await response.json();
+        if (changes.reset) return fetchVideos();
+
+        const { videos: changed, deleted } = changes;
+        setVideos(prev => {
+          const removed = new Set([...deleted, ...changed.map(v => v.id)]);
+          const visible = changed.filter(v => filterStatus === 'all' || v.status === filterStatus);
+          return [...visible, ...prev.filter(v => !removed.has(v.id))]
+            .sort((a, b) => b.created_at.localeCompare(a.created_at));
+        });
+        watermark.current = changes.watermark;
+        afterId = changes.cursor_id;
+      } while (changes.has_more);
+    } catch (error) {
+      console.error('Failed to refresh videos:', error);
+    }
+  };
+
   const handleUploadComplete = () => {
     setShowUpload(false);
-    fetchVideos();
+    refreshVideos();
   };
 
   const handleDelete = async (videoId) => {
@@ -102,7 +160,7 @@ export default function Dashboard({ user, token, socket, onLogout }) {
 
       if (response.ok) {
         toast.success('Video deleted successfully');
-        fetchVideos();
+        refreshVideos();
       } else {
         toast.error('Failed to delete video');
       }
@@ -175,6 +233,8 @@ export default function Dashboard({ user, token, socket, onLogout }) {
               <input
                 type="text"
                 placeholder="Search videos..."
+                value={searchQuery}
+                onChange={(e) => setSearchQuery(e.target.value)}
                 className="pl-10 pr-4 py-2 rounded-full bg-slate-100 border-none focus:ring-2 focus:ring-blue-500/20 w-64 text-sm"
               />
             </div>
@@ -0,0 +1,67 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Backend modules are flat and imported by name, as server.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+class Clock:
+    """Stands in for time.monotonic; tests move it with `clock.now += seconds`."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """The server module on a fresh MockDB, marked ready without running startup."""
+    # Never the database named in backend/.env
+    monkeypatch.setenv("DOTENV_OVERRIDE", "0")
+    monkeypatch.setenv("MONGO_URL", "")
+    import server
+    from mock_db import MockDB
+    from rate_limit import InMemoryRateLimitBackend
+    from search import NameIndex
+    from storage import InMemoryUsageTracker
+
+    db = MockDB()
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "read_db", db)
+    monkeypatch.setattr(server, "name_index", NameIndex())
+    monkeypatch.setattr(server, "rate_limit_backend", InMemoryRateLimitBackend())
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server.storage, "hot_dir", tmp_path)
+    monkeypatch.setattr(server.storage, "usage", InMemoryUsageTracker())
+    monkeypatch.setattr(server.readiness, "state", "ready")
+    return server
+
+
+def api_client(server):
+    """HTTP client for the app; open it inside the test's event loop."""
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+
+
+async def register(client, email="alice@example.com", role="viewer"):
+    """Registers a user and returns (auth headers, user id)."""
+    response = await client.post(
+        "/api/auth/register",
+        json={"username": email.split("@")[0], "email": email, "password": "secret", "role": role}
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]
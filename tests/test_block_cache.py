@@ -0,0 +1,186 @@
+import asyncio
+import os
+
+import pytest
+
+from block_cache import BlockCache
+
+BLOCK = 16
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(100)))
+    fd = os.open(path, os.O_RDONLY)
+    yield path, fd
+    os.close(fd)
+
+
+def read(cache, video_id, fd, block, filename="video.mp4"):
+    return asyncio.run(cache.read(video_id, filename, fd, block))
+
+
+def read_released(cache, video_id, fd, block, times=1, filename="video.mp4"):
+    for _ in range(times):
+        block_ = read(cache, video_id, fd, block, filename)
+        data = bytes(block_.view)
+        cache.release(block_)
+    return data
+
+
+def test_reads_blocks_into_the_slab(video_file):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=4 * BLOCK, block_size=BLOCK)
+
+    block = read(cache, "v", fd, 1)
+    assert block.slot is not None
+    assert block.view.obj is cache.slab
+    assert bytes(block.view) == bytes(range(16, 32))
+    cache.release(block)
+
+    # The last block is short
+    assert read_released(cache, "v", fd, 6) == bytes(range(96, 100))
+    assert read_released(cache, "v", fd, 1) == bytes(range(16, 32))
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_disabled_cache_reads_directly(video_file):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=0, block_size=BLOCK)
+
+    block = read(cache, "v", fd, 2)
+    assert block.slot is None
+    assert bytes(block.view) == bytes(range(32, 48))
+    cache.release(block)
+
+
+def test_tinylfu_rejects_cold_blocks_when_full(video_file):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=2 * BLOCK, block_size=BLOCK)
+    read_released(cache, "v", fd, 0, times=5)
+    read_released(cache, "v", fd, 1, times=5)
+
+    # A one-off read of another block doesn't displace the hot ones
+    assert read_released(cache, "v", fd, 2) == bytes(range(32, 48))
+    assert cache.rejected == 1
+    assert set(cache.slots) == {("v", "video.mp4", 0), ("v", "video.mp4", 1)}
+
+    # Once it is more popular than the LRU victim it gets in
+    read_released(cache, "v", fd, 2, times=10)
+    assert ("v", "video.mp4", 2) in cache.slots
+    assert ("v", "video.mp4", 0) not in cache.slots
+    assert cache.evictions == 1
+
+
+def test_pinned_blocks_are_not_evicted(video_file):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=2 * BLOCK, block_size=BLOCK)
+    pinned = [read(cache, "v", fd, 0), read(cache, "v", fd, 1)]
+
+    read_released(cache, "v", fd, 2, times=10)
+    assert set(cache.slots) == {("v", "video.mp4", 0), ("v", "video.mp4", 1)}
+    assert bytes(pinned[0].view) == bytes(range(16))
+
+    # The oldest unpinned block is the victim, even if it isn't the LRU one
+    cache.release(pinned[1])
+    read_released(cache, "v", fd, 2, times=10)
+    assert set(cache.slots) == {("v", "video.mp4", 0), ("v", "video.mp4", 2)}
+    cache.release(pinned[0])
+
+
+def test_invalidate_while_pinned_retires_the_slot(video_file):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=2 * BLOCK, block_size=BLOCK)
+    block = read(cache, "v", fd, 0)
+
+    cache.invalidate("v")
+    assert cache.slots == {}
+    assert block.slot in cache.retired
+    assert block.slot not in cache.free
+    # The reader still sees the bytes it pinned
+    assert bytes(block.view) == bytes(range(16))
+
+    # The file is rewritten; the next read misses and sees the new content
+    path.write_bytes(bytes(reversed(range(100))))
+    assert read_released(cache, "v", fd, 0) == bytes(reversed(range(84, 100)))
+
+    cache.release(block)
+    assert block.slot not in cache.retired
+    assert block.slot in cache.free
+
+
+def test_fill_racing_an_invalidation_is_not_cached(video_file, monkeypatch):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=2 * BLOCK, block_size=BLOCK)
+    preadv = os.preadv
+
+    def invalidating_preadv(*args):
+        cache.invalidations += 1  # as if invalidate() ran during the read
+        return preadv(*args)
+
+    monkeypatch.setattr(os, "preadv", invalidating_preadv)
+    block = read(cache, "v", fd, 0)
+    assert bytes(block.view) == bytes(range(16))
+    assert ("v", "video.mp4", 0) not in cache.slots
+    assert block.slot in cache.retired
+
+    cache.release(block)
+    assert block.slot in cache.free
+
+
+def test_replaced_file_misses_without_invalidation(video_file, tmp_path):
+    path, fd = video_file
+    cache = BlockCache(capacity_bytes=4 * BLOCK, block_size=BLOCK)
+    read_released(cache, "v", fd, 0, times=3)
+
+    # Another worker transcoded the video: same id, new file, and this
+    # worker's cache was never invalidated
+    new_path = tmp_path / "transcoded.mp4"
+    new_path.write_bytes(b"n" * 40)
+    new_fd = os.open(new_path, os.O_RDONLY)
+    try:
+        assert read_released(cache, "v", new_fd, 0, filename="transcoded.mp4") == b"n" * 16
+    finally:
+        os.close(new_fd)
+
+    cache.invalidate("v")
+    assert cache.slots == {}
+    assert "v" not in cache.by_video
+
+
+def test_streamed_chunks_do_not_share_the_slab(server, monkeypatch):
+    monkeypatch.setattr(server, "block_cache", BlockCache(capacity_bytes=4 * BLOCK, block_size=BLOCK))
+    monkeypatch.setattr(server, "STREAM_CHUNK_SIZE", 5)
+    content = bytes(range(100))
+    (server.UPLOAD_DIR / "v1.mp4").write_bytes(content)
+    token, _ = server.stream_signer.sign({"id": "v1", "filename": "v1.mp4"}, "alice", "viewer")
+    kept = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        # Like a transport buffer: holds what it was given, uncopied
+        if message["type"] == "http.response.body":
+            kept.append(message["body"])
+
+    asyncio.run(server.app({
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/videos/v1/stream/signed",
+        "raw_path": b"/api/videos/v1/stream/signed",
+        "query_string": f"token={token}".encode(),
+        "root_path": "",
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }, receive, send))
+
+    assert not any(server.block_cache.pins)
+    # Slots are reused by later reads once released
+    server.block_cache.slab[:] = bytes(len(server.block_cache.slab))
+    assert b"".join(kept) == content
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from tests.conftest import api_client, register
+
+# Recent enough to be inside tombstone retention
+T0 = datetime.now(timezone.utc) - timedelta(hours=1)
+
+
+def iso(dt):
+    return dt.isoformat()
+
+
+async def insert_video(server, video_id, user_id, updated_at):
+    await server.db.videos.insert_one({
+        "id": video_id,
+        "user_id": user_id,
+        "filename": f"{video_id}.mp4",
+        "original_name": f"{video_id}.mp4",
+        "file_size": 1,
+        "status": "completed",
+        "sensitivity": "safe",
+        "upload_progress": 100,
+        "processing_progress": 100,
+        "created_at": iso(updated_at),
+        "updated_at": iso(updated_at),
+    })
+
+
+async def changes(client, headers, since, after_id=None, limit=500):
+    params = {"since": since, "limit": limit}
+    if after_id:
+        params["after_id"] = after_id
+    response = await client.get("/api/videos/changes", headers=headers, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_pages_through_equal_timestamps_by_id(server):
+    async def scenario():
+        async with api_client(server) as client:
+            headers, user_id = await register(client)
+            for video_id in ("e", "a", "d", "b", "c"):
+                await insert_video(server, video_id, user_id, T0)
+            await insert_video(server, "f", user_id, T0 + timedelta(seconds=1))
+
+            seen = []
+            since, after_id = iso(T0 - timedelta(seconds=1)), None
+            while True:
+                page = await changes(client, headers, since, after_id, limit=2)
+                seen += [v["id"] for v in page["videos"]]
+                since, after_id = page["watermark"], page["cursor_id"]
+                if not page["has_more"]:
+                    break
+            assert seen == ["a", "b", "c", "d", "e", "f"]
+            assert after_id is None
+            # Caught up: the next poll starts from the server clock, not the last change
+            assert since > iso(T0 + timedelta(seconds=1))
+
+    asyncio.run(scenario())
+
+
+def test_reports_tombstones_since_the_watermark(server):
+    async def scenario():
+        async with api_client(server) as client:
+            headers, user_id = await register(client)
+            await server.db.video_tombstones.insert_many([
+                {"id": "old", "user_id": user_id, "deleted_at": iso(T0 - timedelta(minutes=1))},
+                {"id": "new", "user_id": user_id, "deleted_at": iso(T0 + timedelta(minutes=1))},
+                {"id": "other", "user_id": "someone-else", "deleted_at": iso(T0 + timedelta(minutes=1))},
+            ])
+            page = await changes(client, headers, iso(T0))
+            assert page["deleted"] == ["new"]
+            assert page["videos"] == []
+
+    asyncio.run(scenario())
+
+
+def test_resets_watermarks_outside_the_retention_window(server):
+    async def scenario():
+        async with api_client(server) as client:
+            headers, _ = await register(client)
+            now = datetime.now(timezone.utc)
+            expired = now - timedelta(days=server.TOMBSTONE_RETENTION_DAYS, seconds=1)
+            # A watermark from a client whose clock runs fast
+            future = now + timedelta(minutes=5)
+            for since in (expired, future):
+                page = await changes(client, headers, iso(since))
+                assert page["reset"] is True
+                assert now - timedelta(seconds=server.CHANGE_FEED_SKEW_SECONDS + 5) < datetime.fromisoformat(page["watermark"]) < now
+
+            page = await changes(client, headers, iso(now - timedelta(days=1)))
+            assert page["reset"] is False
+
+    asyncio.run(scenario())
+
+
+def test_list_returns_the_watermark_to_poll_from(server):
+    async def scenario():
+        async with api_client(server) as client:
+            headers, user_id = await register(client)
+            # Last changed long ago: the watermark still comes from the server clock
+            await insert_video(server, "v1", user_id, T0 - timedelta(days=30))
+
+            before = datetime.now(timezone.utc)
+            response = await client.get("/api/videos", headers=headers)
+            watermark = response.headers[server.WATERMARK_HEADER]
+            assert datetime.fromisoformat(watermark) <= before
+            assert datetime.fromisoformat(watermark) >= before - timedelta(seconds=server.CHANGE_FEED_SKEW_SECONDS + 5)
+
+            # A 304 for the cached body carries the watermark it was read with
+            etag = response.headers["ETag"]
+            cached = await client.get("/api/videos", headers={**headers, "If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.headers[server.WATERMARK_HEADER] == watermark
+
+            await insert_video(server, "v2", user_id, datetime.now(timezone.utc))
+            page = await changes(client, headers, watermark)
+            assert page["reset"] is False
+            assert [v["id"] for v in page["videos"]] == ["v2"]
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from events import FileEventSink
+
+CEST = timezone(timedelta(hours=2))
+
+
+def write(sink, *timestamps):
+    events = [
+        {"ts": ts, "type": "video.uploaded", "user_id": "u1", "video_id": f"v{i}", "worker": 1, "data": {}}
+        for i, ts in enumerate(timestamps)
+    ]
+    asyncio.run(sink.write(events))
+
+
+def query(sink, since=None, until=None, filters=None, limit=100):
+    events = asyncio.run(sink.query(since, until, filters or {}, limit))
+    return [event["video_id"] for event in events]
+
+
+def test_query_compares_instants_across_utc_offsets(tmp_path):
+    sink = FileEventSink(tmp_path, max_bytes=1 << 20, backups=2)
+    base = datetime(2026, 10, 19, 10, 0, tzinfo=timezone.utc)
+    write(sink, base, base + timedelta(minutes=10), base + timedelta(minutes=20))
+
+    # 12:05+02:00 is 10:05 UTC, but sorts after every "10:..." string
+    assert query(sink, since=datetime(2026, 10, 19, 12, 5, tzinfo=CEST)) == ["v2", "v1"]
+    assert query(sink, until=datetime(2026, 10, 19, 12, 15, tzinfo=CEST)) == ["v1", "v0"]
+    # Naive times are UTC
+    assert query(sink, since=datetime(2026, 10, 19, 10, 10)) == ["v2", "v1"]
+
+
+def test_query_spans_rotated_files_newest_first(tmp_path):
+    sink = FileEventSink(tmp_path, max_bytes=300, backups=3)
+    base = datetime(2026, 10, 19, 10, 0, tzinfo=timezone.utc)
+    for i in range(4):
+        write(sink, base + timedelta(minutes=i))
+    assert sink.path.with_name("events.jsonl.1").exists()
+
+    assert query(sink) == ["v0"] * 4
+    assert len(query(sink, since=base + timedelta(minutes=1, seconds=30))) == 2
+    assert len(query(sink, limit=3)) == 3
+
+
+def test_query_orders_events_written_out_of_order(tmp_path):
+    sink = FileEventSink(tmp_path, max_bytes=1 << 20, backups=2)
+    base = datetime(2026, 10, 19, 10, 0, tzinfo=timezone.utc)
+    # Two workers flushing their batches: the second batch starts earlier
+    write(sink, base + timedelta(minutes=5), base + timedelta(minutes=6))
+    asyncio.run(sink.write([
+        {"ts": base + timedelta(minutes=m), "type": "video.uploaded", "user_id": "u1", "video_id": f"w{m}", "worker": 2, "data": {}}
+        for m in (1, 7)
+    ]))
+
+    assert query(sink) == ["w7", "v1", "v0", "w1"]
+    assert query(sink, limit=2) == ["w7", "v1"]
+    # An event older than `since` written after newer ones does not end the scan
+    assert query(sink, since=base + timedelta(minutes=2)) == ["w7", "v1", "v0"]
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+LEASE = 0.3
+
+
+@pytest.fixture
+def processing(server, monkeypatch):
+    monkeypatch.setattr(server, "PROCESSING_LEASE_SECONDS", LEASE)
+    return server
+
+
+async def insert_processing(server, video_id, **fields):
+    await server.db.videos.insert_one({
+        "id": video_id,
+        "user_id": "alice",
+        "filename": f"{video_id}.mp4",
+        "status": "processing",
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **fields
+    })
+
+
+def blocking_transcode(monkeypatch, server, started):
+    """Makes processing wait forever in the transcode step, like a job queued for a slot."""
+    async def transcode_video(video_id, user_id, owner):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(type(server.transcoder), "available", property(lambda self: True))
+    monkeypatch.setattr(server, "transcode_video", transcode_video)
+
+
+def test_running_job_keeps_its_lease(processing, monkeypatch):
+    server = processing
+
+    async def scenario():
+        started = asyncio.Event()
+        blocking_transcode(monkeypatch, server, started)
+        owner = server.new_processing_owner()
+        await insert_processing(server, "v1", **server.processing_lease(owner))
+        job = asyncio.create_task(server.process_video("v1", "alice", "v1.mp4", owner))
+        await started.wait()
+
+        # Several lease lengths without a progress write
+        await asyncio.sleep(LEASE * 3)
+        assert await server.recover_stale_processing() == 0
+        video = await server.db.videos.find_one({"id": "v1"})
+        assert video["processing_owner"] == owner
+
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_interrupted_job_stays_processing_and_is_recovered(processing, monkeypatch):
+    server = processing
+    spawned = []
+    monkeypatch.setattr(server.background_jobs, "spawn", lambda coro: spawned.append(coro) or coro.close())
+
+    async def scenario():
+        started = asyncio.Event()
+        blocking_transcode(monkeypatch, server, started)
+        owner = server.new_processing_owner()
+        await insert_processing(server, "v1", **server.processing_lease(owner))
+        job = asyncio.create_task(server.process_video("v1", "alice", "v1.mp4", owner))
+        await started.wait()
+
+        # What the shutdown drain does to a job still running at its timeout
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+        video = await server.db.videos.find_one({"id": "v1"})
+        assert video["status"] == "processing"
+
+        assert await server.recover_stale_processing() == 1
+        video = await server.db.videos.find_one({"id": "v1"})
+        assert video["processing_owner"] != owner
+        # Claimed once: the new lease is live
+        assert await server.recover_stale_processing() == 0
+
+    asyncio.run(scenario())
+    assert len(spawned) == 1
+
+
+def test_expired_and_legacy_jobs_are_recovered(processing, monkeypatch):
+    server = processing
+    monkeypatch.setattr(server.background_jobs, "spawn", lambda coro: coro.close())
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+
+    async def scenario():
+        await insert_processing(server, "expired", processing_owner="dead", processing_lease_until=past.isoformat())
+        # From before leases: judged by its last progress write
+        await insert_processing(server, "legacy-stale", updated_at=past.isoformat())
+        await insert_processing(server, "legacy-fresh")
+        await insert_processing(server, "live", **server.processing_lease("alive"))
+
+        assert await server.recover_stale_processing() == 2
+        owners = {v["id"]: v.get("processing_owner") for v in await server.db.videos.find({}).to_list(None)}
+        assert owners["expired"] not in (None, "dead")
+        assert owners["legacy-stale"] is not None
+        assert owners["legacy-fresh"] is None
+        assert owners["live"] == "alive"
+
+    asyncio.run(scenario())
+
+
+def test_job_stops_when_its_lease_is_taken_over(processing, monkeypatch):
+    server = processing
+
+    async def scenario():
+        started = asyncio.Event()
+        blocking_transcode(monkeypatch, server, started)
+        owner = server.new_processing_owner()
+        await insert_processing(server, "v1", **server.processing_lease(owner))
+        job = asyncio.create_task(server.process_video("v1", "alice", "v1.mp4", owner))
+        await started.wait()
+
+        await server.db.videos.update_one({"id": "v1"}, {"$set": server.processing_lease("other-worker")})
+        await asyncio.wait_for(asyncio.gather(job, return_exceptions=True), LEASE * 2)
+        assert job.cancelled()
+        video = await server.db.videos.find_one({"id": "v1"})
+        assert video["processing_owner"] == "other-worker"
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from rate_limit import InMemoryRateLimitBackend, RateLimit
+from tests.conftest import api_client, register
+
+
+def take(backend, rate=1.0, burst=2):
+    return asyncio.run(backend.take_token("k", rate, burst))
+
+
+def test_token_bucket_refills_at_rate(clock):
+    backend = InMemoryRateLimitBackend()
+    assert take(backend) == 0
+    assert take(backend) == 0
+    assert take(backend) == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert take(backend) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert take(backend) == 0
+    assert take(backend) == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_up_to_burst(clock):
+    backend = InMemoryRateLimitBackend()
+    for _ in range(2):
+        take(backend)
+
+    clock.now += 60
+    assert take(backend) == 0
+    assert take(backend) == 0
+    assert take(backend) > 0
+
+
+def test_check_raises_429_with_retry_after(clock):
+    backend = InMemoryRateLimitBackend()
+    limit = RateLimit("stream", rate_per_minute=30, burst=1, max_concurrent=0)
+    asyncio.run(limit.check(backend, "u1"))
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(limit.check(backend, "u1"))
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "2"
+
+    # Users have separate buckets
+    asyncio.run(limit.check(backend, "u2"))
+
+
+def test_concurrency_slots_are_leased(clock):
+    backend = InMemoryRateLimitBackend()
+    limit = RateLimit("upload", rate_per_minute=0, burst=0, max_concurrent=2, lease_seconds=30)
+
+    first = asyncio.run(limit.acquire(backend, "u1"))
+    second = asyncio.run(limit.acquire(backend, "u1"))
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(limit.acquire(backend, "u1"))
+    assert excinfo.value.status_code == 429
+
+    asyncio.run(limit.release(backend, "u1", first))
+    third = asyncio.run(limit.acquire(backend, "u1"))
+
+    # A holder that never releases loses its slot when the lease expires
+    clock.now += 31
+    asyncio.run(limit.acquire(backend, "u1"))
+    asyncio.run(limit.release(backend, "u1", second))
+    asyncio.run(limit.release(backend, "u1", third))
+
+
+def test_unlimited_concurrency_skips_the_backend():
+    limit = RateLimit("stream", rate_per_minute=60, burst=1, max_concurrent=0)
+    backend = InMemoryRateLimitBackend()
+    lease = asyncio.run(limit.acquire(backend, "u1"))
+    assert lease is None
+    asyncio.run(limit.release(backend, "u1", lease))
+    assert backend.slots == {}
+
+
+def test_burst_must_allow_one_request():
+    with pytest.raises(ValueError):
+        RateLimit("upload", rate_per_minute=10, burst=0, max_concurrent=2)
+    # A disabled rate needs no burst
+    RateLimit("upload", rate_per_minute=0, burst=0, max_concurrent=2)
+
+
+def test_full_buckets_are_evicted(clock):
+    backend = InMemoryRateLimitBackend()
+    for user in ("u1", "u2", "u3"):
+        asyncio.run(backend.take_token(user, 1.0, 2))
+    assert len(backend.buckets) == 3
+
+    # u1 and u2 have refilled; u3 took another token and is still refilling
+    clock.now += 0.5
+    asyncio.run(backend.take_token("u3", 1.0, 2))
+    clock.now += 0.6
+    asyncio.run(backend.take_token("u4", 1.0, 2))
+    assert list(backend.buckets) == ["u3", "u4"]
+
+
+def test_rejected_upload_costs_no_token(server, monkeypatch):
+    monkeypatch.setattr(server, "upload_limit", RateLimit("upload", rate_per_minute=1, burst=1, max_concurrent=2))
+
+    async def scenario():
+        async with api_client(server) as client:
+            headers, _ = await register(client)
+            for _ in range(3):
+                response = await client.post(
+                    "/api/videos/upload", headers=headers,
+                    files={"file": ("notes.txt", b"text", "text/plain")}
+                )
+                assert response.status_code == 400
+            video = {"file": ("clip.mp4", b"\x00" * 64, "video/mp4")}
+            assert (await client.post("/api/videos/upload", headers=headers, files=video)).status_code == 200
+            assert (await client.post("/api/videos/upload", headers=headers, files=video)).status_code == 429
+
+    asyncio.run(scenario())
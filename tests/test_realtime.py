@@ -0,0 +1,100 @@
+import asyncio
+import json
+import re
+import shutil
+import subprocess
+import uuid
+from pathlib import Path
+
+import pytest
+
+from realtime import COMPACT_UPDATE, UNKNOWN, decode_compact, encode_compact
+
+DASHBOARD = Path(__file__).resolve().parent.parent / "frontend" / "src" / "pages" / "Dashboard.jsx"
+
+UPDATES = [
+    {"video_id": str(uuid.uuid4()), "progress": 40, "status": "processing"},
+    {"video_id": str(uuid.uuid4()), "progress": 100, "status": "completed", "sensitivity": "flagged"},
+    {"video_id": str(uuid.uuid4()), "status": "failed", "sensitivity": "safe"},
+    {"video_id": str(uuid.uuid4()), "progress": 0, "status": "uploading", "sensitivity": None},
+    {"video_id": str(uuid.uuid4())},
+]
+
+
+def test_compact_round_trip():
+    data = encode_compact(UPDATES)
+    assert len(data) == 1 + len(UPDATES) * COMPACT_UPDATE.size
+    assert decode_compact(data) == UPDATES
+    assert decode_compact(encode_compact([])) == []
+
+
+def test_compact_marks_unknown_values():
+    video_id = str(uuid.uuid4())
+    data = encode_compact([{"video_id": video_id, "status": "archived", "sensitivity": "maybe"}])
+    assert data[-3:] == bytes([UNKNOWN, UNKNOWN, UNKNOWN])
+    assert decode_compact(data) == [{"video_id": video_id}]
+
+
+def test_compact_rejects_other_versions():
+    data = encode_compact(UPDATES)
+    with pytest.raises(ValueError):
+        decode_compact(b"\x02" + data[1:])
+    with pytest.raises(ValueError):
+        decode_compact(b"")
+
+
+def dashboard_decoder() -> str:
+    """decodeUpdates and the code tables it uses, as written in Dashboard.jsx."""
+    source = DASHBOARD.read_text()
+    parts = [
+        re.search(r"^const STATUS_CODES = .*?;$", source, re.M).group(0),
+        re.search(r"^const SENSITIVITY_CODES = .*?;$", source, re.M).group(0),
+        re.search(r"^const decodeUpdates = .*?^};$", source, re.M | re.S).group(0),
+    ]
+    return "\n".join(parts)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_dashboard_decodes_what_the_server_encodes():
+    data = encode_compact(UPDATES)
+    script = dashboard_decoder() + f"""
+const frame = Buffer.from({json.dumps(data.hex())}, 'hex');
+const payload = frame.buffer.slice(frame.byteOffset, frame.byteOffset + frame.length);
+process.stdout.write(JSON.stringify([decodeUpdates(payload), decodeUpdates({json.dumps(UPDATES)})]));
+"""
+    output = subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout
+    compact, as_json = json.loads(output)
+    assert compact == decode_compact(data)
+    # JSON frames pass through unchanged
+    assert as_json == UPDATES
+
+
+@pytest.fixture
+def sockets(server, monkeypatch):
+    sessions = {"alice-sid": {"user_id": "alice", "role": "viewer"}, "admin-sid": {"user_id": "root", "role": "admin"}}
+    rooms = []
+
+    async def get_session(sid):
+        return sessions[sid]
+
+    async def enter_room(sid, room):
+        rooms.append((sid, room))
+
+    monkeypatch.setattr(server.sio, "get_session", get_session)
+    monkeypatch.setattr(server.sio, "enter_room", enter_room)
+    return server, rooms
+
+
+def test_joining_another_users_room_is_refused(sockets):
+    server, rooms = sockets
+    assert asyncio.run(server.join_room("alice-sid", {"user_id": "bob"})) is False
+    assert rooms == []
+    # Their own room (already joined on connect) is fine
+    assert asyncio.run(server.join_room("alice-sid", {"user_id": "alice"})) is True
+    assert rooms == []
+
+
+def test_admins_may_watch_other_users(sockets):
+    server, rooms = sockets
+    assert asyncio.run(server.join_room("admin-sid", {"user_id": "bob"})) is True
+    assert rooms == [("admin-sid", "bob")]
@@ -0,0 +1,131 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import response_cache
+from response_cache import ALL_USERS, ENTRY_OVERHEAD, ResponseCache, etag_matches
+from tests.conftest import api_client, register
+
+
+def test_put_and_get(clock):
+    cache = ResponseCache(max_bytes=10000, ttl=30)
+    entry = cache.put(("video", "v1"), b'{"id":"v1"}', cache.version, owner_id="alice")
+    assert cache.get(("video", "v1")) is entry
+    assert entry.etag.startswith('"') and entry.etag.endswith('"')
+    assert cache.get(("video", "v2")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_bytes=10000, ttl=30)
+    cache.put(("video", "v1"), b"{}", cache.version, owner_id="alice")
+    clock.now += 31
+    assert cache.get(("video", "v1")) is None
+    assert cache.bytes == 0
+
+
+def test_invalidate_drops_the_video_and_listings_that_can_contain_it(clock):
+    cache = ResponseCache(max_bytes=10000, ttl=30)
+    cache.put(("video", "v1"), b"{}", cache.version, owner_id="alice")
+    cache.put(("video", "v2"), b"{}", cache.version, owner_id="bob")
+    cache.put(("list", "alice"), b"[]", cache.version, scope="alice")
+    cache.put(("list", "bob"), b"[]", cache.version, scope="bob")
+    cache.put(("list", ALL_USERS), b"[]", cache.version, scope=ALL_USERS)
+
+    cache.invalidate_video("v1", "alice")
+    assert set(cache.entries) == {("video", "v2"), ("list", "bob")}
+    assert cache.invalidations == 3
+    assert set(cache.scopes) == {"bob"}
+
+
+def test_responses_read_before_an_invalidation_are_not_stored(clock):
+    cache = ResponseCache(max_bytes=10000, ttl=30)
+    version = cache.version
+    cache.invalidate_video("v1", "alice")
+    entry = cache.put(("video", "v1"), b"{}", version, owner_id="alice")
+    assert entry.body == b"{}"
+    assert cache.get(("video", "v1")) is None
+
+
+def test_invalidations_only_hold_back_what_they_touch(clock):
+    cache = ResponseCache(max_bytes=10000, ttl=30)
+    version = cache.version
+    # A progress update on one of alice's videos, while other reads were running
+    cache.invalidate_video("v1", "alice")
+    cache.put(("video", "v2"), b"{}", version, owner_id="bob")
+    cache.put(("list", "bob"), b"[]", version, scope="bob")
+    cache.put(("list", "alice"), b"[]", version, scope="alice")
+    cache.put(("list", ALL_USERS), b"[]", version, scope=ALL_USERS)
+    assert set(cache.entries) == {("video", "v2"), ("list", "bob")}
+
+
+def test_forgotten_invalidations_hold_back_every_older_read(clock, monkeypatch):
+    monkeypatch.setattr(response_cache, "REMEMBERED_INVALIDATIONS", 3)
+    cache = ResponseCache(max_bytes=10000, ttl=30)
+    version = cache.version
+    cache.invalidate_video("v1", "alice")
+    cache.invalidate_video("v2", "bob")
+    assert len(cache.invalidated) == 3
+    # bob's entry was dropped, so any read from before it is suspect
+    cache.put(("list", "carol"), b"[]", version, scope="carol")
+    assert cache.get(("list", "carol")) is None
+    cache.put(("list", "carol"), b"[]", cache.version, scope="carol")
+    assert cache.get(("list", "carol")) is not None
+
+
+def test_lru_eviction_under_byte_budget(clock):
+    body = b"x" * 100
+    cache = ResponseCache(max_bytes=2 * (len(body) + ENTRY_OVERHEAD), ttl=30)
+    cache.put("a", body, cache.version)
+    cache.put("b", body, cache.version)
+    cache.get("a")
+    cache.put("c", body, cache.version)
+    assert set(cache.entries) == {"a", "c"}
+    assert cache.evictions == 1
+    assert cache.bytes == 2 * (len(body) + ENTRY_OVERHEAD)
+
+    # Bigger than the whole budget: returned but not stored
+    cache.put("d", b"x" * 1000, cache.version)
+    assert "d" not in cache.entries
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", "abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"x"', etag)
+    assert not etag_matches(None, etag)
+
+
+
+def test_transcoding_invalidates_the_cached_video(server, monkeypatch):
+    async def transcode(source, target, work_dir, on_progress):
+        target.write_bytes(b"mp4" * 10)
+        return SimpleNamespace(duration=1.5)
+
+    monkeypatch.setattr(server.transcoder, "transcode", transcode)
+
+    async def scenario():
+        async with api_client(server) as client:
+            headers, user_id = await register(client)
+            (server.UPLOAD_DIR / "v1.avi").write_bytes(b"avi")
+            owner = server.new_processing_owner()
+            await server.db.videos.insert_one({
+                "id": "v1", "user_id": user_id, "filename": "v1.avi", "original_name": "v1.avi",
+                "file_size": 3, "content_type": "video/x-msvideo", "status": "processing",
+                "sensitivity": "pending", "upload_progress": 100, "processing_progress": 0,
+                "created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-01T00:00:00+00:00",
+                **server.processing_lease(owner)
+            })
+            before = await client.get("/api/videos/v1", headers=headers)
+            assert before.json()["file_size"] == 3
+
+            assert await server.transcode_video("v1", user_id, owner)
+            after = await client.get("/api/videos/v1", headers=headers)
+            assert after.json()["file_size"] == 30
+            assert after.json()["filename"].endswith(".mp4")
+
+    asyncio.run(scenario())
@@ -0,0 +1,206 @@
+import pytest
+
+import search
+from search import NameIndex, SortedTokens, parse_query, tokenize
+
+
+@pytest.fixture
+def small_buckets(monkeypatch):
+    monkeypatch.setattr(SortedTokens, "BUCKET_SIZE", 4)
+
+
+def test_tokenize_and_parse_query():
+    assert tokenize("My_Trip-2023 trip.MP4") == ["my", "trip", "2023", "mp4"]
+    assert parse_query("beach tr") == (["beach"], "tr")
+    assert parse_query("beach tr ") == (["beach", "tr"], None)
+    assert parse_query("--") == ([], None)
+
+
+def test_sorted_tokens_prefix_across_bucket_splits(small_buckets):
+    tokens = SortedTokens()
+    words = [f"{letter}{i:02d}" for letter in "bac" for i in range(12)]
+    for word in words:
+        tokens.add(word)
+
+    assert len(tokens.buckets) > 3
+    assert all(len(bucket) <= 2 * SortedTokens.BUCKET_SIZE for bucket in tokens.buckets)
+    assert [t for bucket in tokens.buckets for t in bucket] == sorted(words)
+    assert tokens.maxes == [bucket[-1] for bucket in tokens.buckets]
+
+    assert list(tokens.prefixed("b")) == sorted(w for w in words if w.startswith("b"))
+    assert list(tokens.prefixed("a1")) == ["a10", "a11"]
+    assert list(tokens.prefixed("c")) == sorted(w for w in words if w.startswith("c"))
+    assert list(tokens.prefixed("d")) == []
+    assert list(tokens.prefixed("0")) == []
+
+
+def test_sorted_tokens_remove_drops_empty_buckets(small_buckets):
+    tokens = SortedTokens()
+    words = [f"t{i:02d}" for i in range(20)]
+    for word in words:
+        tokens.add(word)
+
+    for word in words[:15]:
+        tokens.remove(word)
+    assert len(tokens) == 5
+    assert list(tokens.prefixed("t")) == words[15:]
+    assert tokens.maxes == [bucket[-1] for bucket in tokens.buckets]
+    assert all(tokens.buckets)
+
+
+def ids(index, q, **kwargs):
+    return [video_id for batch in index.search(q, **kwargs) for video_id in batch]
+
+
+@pytest.fixture
+def index(small_buckets):
+    index = NameIndex()
+    names = {
+        "v1": "Beach trip 2023.mp4",
+        "v2": "Birthday party.mov",
+        "v3": "beach_volleyball.mp4",
+        "v4": "Lecture 01.mp4",
+        "v5": "Trip to the mountains.avi",
+    }
+    for i, (video_id, name) in enumerate(names.items()):
+        index.add(video_id, name, owner="alice" if i % 2 == 0 else "bob", status="completed", sensitivity="safe")
+    return index
+
+
+def test_prefix_search_newest_first(index):
+    assert ids(index, "b") == ["v3", "v2", "v1"]
+    assert ids(index, "beach") == ["v3", "v1"]
+    assert ids(index, "beach ") == ["v3", "v1"]
+    assert ids(index, "beach t") == ["v1"]
+    assert ids(index, "trip") == ["v5", "v1"]
+    assert ids(index, "zzz") == []
+    assert ids(index, "beach zzz") == []
+
+
+def test_prefix_search_across_many_tokens(small_buckets):
+    index = NameIndex()
+    for i in range(200):
+        index.add(f"v{i}", f"clip{i:03d} take{i % 7}.mp4")
+    assert len(index.tokens.buckets) > 10
+
+    assert ids(index, "clip1") == [f"v{i}" for i in range(199, 99, -1)]
+    assert ids(index, "take3 clip0") == [f"v{i}" for i in range(99, -1, -1) if i % 7 == 3]
+
+
+def test_search_batches(index):
+    assert list(index.search("mp4", batch_size=2)) == [["v4", "v3"], ["v1"]]
+
+
+def test_owner_and_field_filters(index):
+    assert ids(index, "beach", owner="alice") == ["v3", "v1"]
+    assert ids(index, "b", owner="bob") == ["v2"]
+    assert ids(index, "b", owner="carol") == []
+
+    index.set_fields("v3", status="failed")
+    assert ids(index, "beach", filters={"status": "failed"}) == ["v3"]
+    assert ids(index, "beach", filters={"status": "completed"}) == ["v1"]
+    assert ids(index, "b", filters={"status": "completed", "sensitivity": "safe"}) == ["v2", "v1"]
+    assert ids(index, "b", filters={"sensitivity": "flagged"}) == []
+
+
+def test_remove_and_readd(index):
+    index.remove("v1")
+    assert ids(index, "beach") == ["v3"]
+    assert ids(index, "2023") == []
+    assert "2023" not in index.postings
+    assert list(index.tokens.prefixed("2023")) == []
+
+    # Re-adding a video replaces its name and moves it to the front
+    index.add("v4", "Beach lecture.mp4", owner="alice")
+    assert ids(index, "beach") == ["v4", "v3"]
+    assert ids(index, "01") == []
+    assert ids(index, "beach", filters={"status": "completed"}) == ["v3"]
+
+
+def test_dense_matches_walk_newest_first(monkeypatch):
+    index = NameIndex()
+    for i in range(50):
+        index.add(f"v{i}", f"video {i}.mp4", status="completed" if i % 2 else "failed")
+    walked = []
+    walk = index._walk_newest
+    monkeypatch.setattr(index, "_walk_newest", lambda *args: walked.append(True) or walk(*args))
+
+    # Most videos match, so a page fills before a full intersection would finish
+    batches = index.search("video", filters={"status": "completed"}, batch_size=1)
+    assert next(batches) == ["v49"]
+    assert walked
+    assert ids(index, "video", filters={"status": "failed"}) == [f"v{i}" for i in range(48, -1, -2)]
+
+
+def test_mongo_filter():
+    assert search.mongo_filter("beach") == {"name_tokens": {"$regex": "^beach"}}
+    assert search.mongo_filter("beach tr") == {"$and": [
+        {"name_tokens": {"$all": ["beach"]}},
+        {"name_tokens": {"$regex": "^tr"}},
+    ]}
+    assert search.mongo_filter("a.b ") == {"name_tokens": {"$all": ["a", "b"]}}
+
+
+def test_prefix_counts_follow_adds_and_removes(index):
+    def recount():
+        tokens, postings = {}, {}
+        for token, ids in index.postings.items():
+            for length in range(1, min(len(token), NameIndex.COUNTED_PREFIX_LENGTH) + 1):
+                tokens[token[:length]] = tokens.get(token[:length], 0) + 1
+                postings[token[:length]] = postings.get(token[:length], 0) + len(ids)
+        return tokens, postings
+
+    index.add("v6", "beach beach bonfire.mp4")
+    index.remove("v2")
+    index.add("v3", "Volleyball finals.mp4")
+    assert (index.prefix_tokens, index.prefix_postings) == recount()
+    assert index._prefix_size("b", 0) == (2, 3)  # beach (v1, v6), bonfire
+
+    for video_id in list(index.docs):
+        index.remove(video_id)
+    assert index.prefix_tokens == index.prefix_postings == {}
+
+
+def test_long_prefixes_are_counted_up_to_the_limit(small_buckets):
+    index = NameIndex()
+    for i in range(100):
+        index.add(f"v{i}", f"clip{i:03d}.mp4")
+    assert index._prefix_size("clip", 10) == (10, 10)
+    assert index._prefix_size("clip", float("inf")) == (100, 100)
+    assert index._prefix_size("clip05", float("inf")) == (10, 10)
+    assert index._prefix_size("clipx", 10) == (0, 0)
+
+
+@pytest.mark.parametrize("costs", [
+    {},
+    # Always walk the newest documents
+    {"SET_CHECK_COST": 0, "NAME_CHECK_COST": 0},
+    # Always collect and sort
+    {"SET_CHECK_COST": 1e9, "NAME_CHECK_COST": 1e9},
+    # Collect, expanding prefixes, then walk to order
+    {"SET_CHECK_COST": 1e-9, "NAME_CHECK_COST": 1e9, "SORT_COST": 1e9, "TOKEN_COST": 0},
+])
+def test_every_plan_returns_the_same_results(small_buckets, monkeypatch, costs):
+    for name, value in costs.items():
+        monkeypatch.setattr(NameIndex, name, value)
+    index = NameIndex()
+    docs = []
+    for i in range(300):
+        name = f"{['trip', 'beach', 'tree'][i % 3]} {'xmas ' if i % 4 == 0 else ''}t{i:03d}.mp4"
+        status = "failed" if i % 5 == 0 else "completed"
+        index.add(f"v{i}", name, owner=str(i % 2), status=status)
+        docs.append((f"v{i}", tokenize(name), str(i % 2), status))
+
+    for q, owner, status in [
+        ("t", None, None), ("t", None, "failed"), ("tr", "1", None), ("trip t1", None, "completed"),
+        ("x", None, "failed"), ("xmas t0", "0", None), ("beach ", None, None), ("t2", "1", "failed"),
+    ]:
+        terms, prefix = parse_query(q)
+        expected = [
+            video_id for video_id, tokens, doc_owner, doc_status in reversed(docs)
+            if all(term in tokens for term in terms)
+            and (prefix is None or any(token.startswith(prefix) for token in tokens))
+            and owner in (None, doc_owner) and status in (None, doc_status)
+        ]
+        filters = {"status": status} if status else None
+        assert ids(index, q, owner=owner, filters=filters, batch_size=7) == expected, q
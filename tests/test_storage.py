@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from mock_db import MockDB
+from storage import InMemoryUsageTracker, StorageManager
+from tests.conftest import api_client, register
+
+
+def test_reserve_holds_uploads_to_the_quota():
+    usage = InMemoryUsageTracker()
+
+    async def scenario():
+        assert await usage.reserve("alice", 60, quota=100)
+        assert not await usage.reserve("alice", 41, quota=100)
+        assert await usage.reserve("alice", 40, quota=100)
+        assert await usage.reserve("bob", 500, quota=None)
+        await usage.release("alice", 30)
+        assert await usage.usage("alice") == 70
+        # Releasing more than is held (e.g. a file counted before tracking) stops at zero
+        await usage.release("bob", 900)
+        assert await usage.usage("bob") == 0
+
+    asyncio.run(scenario())
+
+
+def test_storage_manager_quota(tmp_path):
+    storage = StorageManager(tmp_path, quota_bytes=100)
+
+    async def scenario():
+        await storage.reserve("alice", 80)
+        with pytest.raises(HTTPException) as error:
+            await storage.reserve("alice", 30)
+        assert error.value.status_code == 413
+        with pytest.raises(HTTPException):
+            await storage.check_room("alice", 30)
+        await storage.check_room("alice", 20)
+
+        # A transcoded file may grow past the quota; shrinking gives bytes back
+        await storage.replace("alice", 80, 150)
+        assert await storage.usage.usage("alice") == 150
+        await storage.replace("alice", 150, 50)
+        assert await storage.usage.usage("alice") == 50
+
+        (tmp_path / "v1.mp4").write_bytes(b"x" * 50)
+        await storage.remove([{"id": "v1", "user_id": "alice", "filename": "v1.mp4", "file_size": 50}])
+        assert not (tmp_path / "v1.mp4").exists()
+        assert await storage.usage.usage("alice") == 0
+
+    asyncio.run(scenario())
+
+
+def test_orphan_sweep_removes_only_old_unowned_files(tmp_path):
+    hot, cold = tmp_path / "hot", tmp_path / "cold"
+    storage = StorageManager(hot, cold, orphan_grace=60, sweep_batch=2)
+    storage.prepare()
+    db = MockDB()
+    old = time.time() - 120
+
+    def write(path, age=old):
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (age, age))
+
+    async def scenario():
+        await db.videos.insert_many([
+            {"id": "v1", "filename": "owned.mp4", "storage_tier": "hot"},
+            {"id": "v2", "filename": "cold.mp4", "storage_tier": "cold"},
+            {"id": "v3", "filename": "moving.mp4", "storage_tier": "moving"},
+            {"id": "v4", "filename": "legacy.mp4"},
+        ])
+        write(hot / "owned.mp4")
+        write(hot / "legacy.mp4")
+        write(hot / "orphan1.mp4")
+        write(hot / "orphan2.mp4")
+        # Still being uploaded, or its video not inserted yet
+        write(hot / "young.mp4", time.time())
+        # Left behind by a move to the cold tier
+        write(hot / "cold.mp4")
+        write(cold / "cold.mp4")
+        write(cold / "moving.mp4")
+        write(cold / "orphan3.mp4")
+
+        assert await storage.sweep_orphans(db.videos, pause=0) == 4
+
+    asyncio.run(scenario())
+    assert sorted(p.name for p in hot.iterdir()) == ["legacy.mp4", "owned.mp4", "young.mp4"]
+    assert sorted(p.name for p in cold.iterdir()) == ["cold.mp4", "moving.mp4"]
+    assert (storage.orphans_removed, storage.orphan_bytes_removed) == (4, 40)
+    assert storage.last_sweep_at is not None
+
+
+def test_upload_reserves_and_delete_releases(server, monkeypatch):
+    monkeypatch.setattr(server.background_jobs, "spawn", lambda coro: coro.close())
+
+    async def scenario():
+        async with api_client(server) as client:
+            headers, user_id = await register(client, role="editor")
+            video = {"file": ("clip.mp4", b"\x00" * 64, "video/mp4")}
+            response = await client.post("/api/videos/upload", headers=headers, files=video)
+            assert response.status_code == 200, response.text
+            video_id = response.json()["video_id"]
+            assert await server.storage.usage.usage(user_id) == 64
+            assert (await server.db.videos.find_one({"id": video_id}))["usage_counted"] is True
+
+            assert (await client.delete(f"/api/videos/{video_id}", headers=headers)).status_code == 200
+            assert await server.storage.usage.usage(user_id) == 0
+
+    asyncio.run(scenario())
+
+
+def test_upload_over_quota_is_rejected_before_the_body_is_read(server, monkeypatch):
+    monkeypatch.setattr(server.storage, "quota", 1000)
+
+    async def scenario():
+        async with api_client(server) as client:
+            headers, _ = await register(client)
+
+        async def receive():
+            raise AssertionError("the body should not be read")
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await server.app({
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/videos/upload",
+            "raw_path": b"/api/videos/upload",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"test"),
+                (b"authorization", headers["Authorization"].encode()),
+                (b"content-type", b"multipart/form-data; boundary=x"),
+                (b"content-length", str(10 ** 9).encode()),
+            ],
+            "client": ("127.0.0.1", 1234),
+            "server": ("test", 80),
+        }, receive, send)
+        assert sent[0]["status"] == 413
+
+    asyncio.run(scenario())
+    assert server.db.videos.data == []
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import pytest
+
+from stream_urls import StreamSigner, _b64decode, _b64encode
+from tests.conftest import api_client, register
+
+VIDEO = {"id": "v1", "filename": "v1.mp4", "storage_tier": "hot"}
+
+
+def tamper(token, **claims):
+    """The token with some claims changed and the original signature kept."""
+    payload, _, signature = token.partition(".")
+    changed = {**json.loads(_b64decode(payload)), **claims}
+    return _b64encode(json.dumps(changed).encode()) + "." + signature
+
+
+def test_valid_token_carries_its_claims():
+    signer = StreamSigner(b"secret", ttl=60)
+    token, expires = signer.sign(VIDEO, "alice", "viewer")
+    claims = signer.verify(token, "v1")
+    assert claims == {"v": "v1", "f": "v1.mp4", "t": "hot", "u": "alice", "r": "viewer", "e": expires}
+
+
+def test_token_for_another_video_is_rejected():
+    signer = StreamSigner(b"secret", ttl=60)
+    token, _ = signer.sign(VIDEO, "alice", "viewer")
+    assert signer.verify(token, "v2") is None
+
+
+@pytest.mark.parametrize("claims", [{"v": "v2"}, {"u": "bob"}, {"r": "admin"}, {"f": "../other.mp4"}, {"e": 2 ** 40}])
+def test_tampered_claims_are_rejected(claims):
+    signer = StreamSigner(b"secret", ttl=60)
+    token, _ = signer.sign(VIDEO, "alice", "viewer")
+    assert signer.verify(tamper(token, **claims), claims.get("v", "v1")) is None
+
+
+def test_expired_token_is_rejected():
+    signer = StreamSigner(b"secret", ttl=-1)
+    token, _ = signer.sign(VIDEO, "alice", "viewer")
+    assert signer.verify(token, "v1") is None
+
+
+def test_token_signed_with_another_key_is_rejected():
+    token, _ = StreamSigner(b"other", ttl=60).sign(VIDEO, "alice", "viewer")
+    assert StreamSigner(b"secret", ttl=60).verify(token, "v1") is None
+
+
+@pytest.mark.parametrize("token", ["", ".", "garbage", "abc.def", "é.ü", "a.b.c"])
+def test_malformed_tokens_are_rejected(token):
+    assert StreamSigner(b"secret", ttl=60).verify(token, "v1") is None
+
+
+def test_malformed_payload_with_a_valid_signature_is_rejected():
+    signer = StreamSigner(b"secret", ttl=60)
+    for payload in ("!!!", _b64encode(b"not json")):
+        assert signer.verify(f"{payload}.{signer._sign(payload)}", "v1") is None
+
+
+def test_signed_stream_endpoint_rejects_bad_tokens(server, monkeypatch):
+    async def scenario():
+        async with api_client(server) as client:
+            headers, user_id = await register(client)
+            (server.UPLOAD_DIR / "v1.mp4").write_bytes(b"video" * 10)
+            await server.db.videos.insert_one({
+                **VIDEO, "user_id": user_id, "original_name": "v1.mp4", "file_size": 50,
+                "content_type": "video/mp4", "status": "completed", "sensitivity": "safe",
+                "upload_progress": 100, "processing_progress": 100,
+                "created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-01T00:00:00+00:00",
+            })
+
+            async def stream(token, video_id="v1"):
+                return await client.get(f"/api/videos/{video_id}/stream/signed", params={"token": token})
+
+            response = await client.get("/api/videos/v1", headers=headers, params={"stream_url": "true"})
+            token = response.json()["stream_url"].split("token=")[1]
+            response = await stream(token)
+            assert response.status_code == 200
+            assert response.content == b"video" * 10
+
+            monkeypatch.setattr(server.stream_signer, "ttl", -1)
+            expired = (await client.get("/api/videos/v1", headers=headers, params={"stream_url": "true"})).json()
+            other_key, _ = StreamSigner(b"other", ttl=60).sign(VIDEO, user_id, "viewer")
+
+            for bad in (
+                tamper(token, u="someone-else"),
+                tamper(token, f="other.mp4"),
+                expired["stream_url"].split("token=")[1],
+                other_key,
+                "garbage",
+                token.partition(".")[0],
+            ):
+                assert (await stream(bad)).status_code == 403, bad
+            # A valid token only opens the video it was issued for
+            assert (await stream(token, video_id="v2")).status_code == 403
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from transcode import Probe, Transcoder
+
+
+@pytest.fixture
+def transcoder():
+    return Transcoder(workers=4, segment_seconds=10)
+
+
+def test_short_file_is_one_segment(transcoder):
+    assert transcoder.plan([0.0, 2.0, 4.0], 5.0) == [(0.0, None)]
+    # No keyframes reported: one segment from the start
+    assert transcoder.plan([], 5.0) == [(0.0, None)]
+
+
+def test_segments_start_at_keyframes_and_the_last_runs_to_the_end(transcoder):
+    keyframes = [float(t) for t in range(0, 25, 2)]
+    assert transcoder.plan(keyframes, 25.0) == [(0.0, 10.0), (10.0, 10.0), (20.0, None)]
+    # Irregular keyframes: each segment runs to the first keyframe 10 s in
+    assert transcoder.plan([0.0, 3.0, 11.0, 14.0, 22.0], 30.0) == [(0.0, 11.0), (11.0, 11.0), (22.0, None)]
+
+
+def test_short_tail_is_merged_into_the_last_segment(transcoder):
+    keyframes = [float(t) for t in range(0, 23, 2)]
+    # A segment at 20 s would be 3 s long, under half the target
+    assert transcoder.plan(keyframes, 23.0) == [(0.0, 10.0), (10.0, None)]
+
+
+def run_transcode(transcoder, tmp_path, probe):
+    """transcode() with ffmpeg replaced; later segments finish first."""
+    calls = []
+    playlists = []
+
+    async def run(*args):
+        calls.append(args)
+        if "concat" in args:
+            playlists.append(open(args[args.index("-i") + 1]).read())
+        elif "-ss" in args:
+            await asyncio.sleep(0.01 * (10 - float(args[args.index("-ss") + 1]) / 10))
+        open(args[-1], "wb").close()
+        return b""
+
+    async def keyframes(path):
+        return [float(t) for t in range(0, 40, 2)]
+
+    async def probe_(path):
+        return probe
+
+    transcoder.ffmpeg = "ffmpeg"
+    transcoder._run = run
+    transcoder.keyframes = keyframes
+    transcoder.probe = probe_
+    source = tmp_path / "in.avi"
+    source.write_bytes(b"avi")
+    assert asyncio.run(transcoder.transcode(source, tmp_path / "out.mp4", tmp_path / "work")) is probe
+    return calls, playlists[0], calls[-1]
+
+
+def test_segments_are_joined_in_order_with_the_audio(transcoder, tmp_path):
+    probe = Probe({
+        "streams": [{"codec_type": "video", "codec_name": "mpeg4"}, {"codec_type": "audio", "codec_name": "mp2"}],
+        "format": {"duration": "40"},
+    })
+    calls, playlist, concat = run_transcode(transcoder, tmp_path, probe)
+
+    segment_starts = [call[call.index("-ss") + 1] for call in calls if "-ss" in call]
+    assert sorted(segment_starts) == ["0.000000", "10.000000", "20.000000", "30.000000"]
+    assert playlist == "".join(f"file 'segment_{i:05d}.ts'\n" for i in range(4))
+    assert any("0:a:0" in call for call in calls)
+    assert concat[concat.index("-map"):concat.index("-c")] == ("-map", "0:v:0", "-map", "1:a:0")
+    assert not (tmp_path / "work").exists() or not any((tmp_path / "work").iterdir())
+
+
+def test_video_without_audio_is_joined_alone(transcoder, tmp_path):
+    probe = Probe({"streams": [{"codec_type": "video", "codec_name": "mpeg4"}], "format": {"duration": "40"}})
+    calls, playlist, concat = run_transcode(transcoder, tmp_path, probe)
+
+    assert playlist == "".join(f"file 'segment_{i:05d}.ts'\n" for i in range(4))
+    assert not any("0:a:0" in call for call in calls)
+    assert "-map" not in concat
+    assert concat.count("-i") == 1